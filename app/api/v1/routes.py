@@ -1,6 +1,9 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
 from fastapi.responses import JSONResponse, FileResponse
 from app.services.pdf_processor import process_pdf
+from app.services.pdf_auditor import AUDIT_MODES
 
 from app.services.pdf_processor import process_pdf
 from app.services.audit_logger import XLSX_PATH
@@ -22,15 +25,27 @@ async def upload_pdf(file: UploadFile = File(...)):
 # 1) Auditoría de un PDF
 # ----------------------------
 @router.post("/audit/pdf")
-async def audit_single_pdf(file: UploadFile = File(...)):
+async def audit_single_pdf(
+    file: UploadFile = File(...),
+    mode: str = Query("standard", description="fast | standard | thorough"),
+    budget_ms: Optional[int] = Query(None, description="Presupuesto de tiempo en ms (omite/corta etapas caras al agotarse)"),
+):
     """
     Sube un PDF, lo audita (OCR + reglas + firma visual + cruce con tabla) y devuelve el resultado.
+    - fast: capa de texto + objetos del PDF (sin OCR ni render), pensado para < 1 s.
+    - standard: flujo completo (default).
+    - thorough: más DPI y más bandas de búsqueda de firma.
+    `result.checks` indica qué etapas corrieron y `result.no_verificados` qué faltantes no son concluyentes.
     """
     if not file.filename or not file.filename.lower().endswith(".pdf"):
         raise HTTPException(status_code=400, detail="Solo archivos PDF válidos")
+    if mode not in AUDIT_MODES:
+        raise HTTPException(status_code=400, detail=f"Modo inválido. Use: {', '.join(AUDIT_MODES)}")
+    if budget_ms is not None and budget_ms <= 0:
+        raise HTTPException(status_code=400, detail="budget_ms debe ser mayor que 0")
 
     try:
-        result = process_pdf(file)
+        result = process_pdf(file, mode=mode, budget_ms=budget_ms)
         return JSONResponse(content=result)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error procesando PDF: {e!s}")
@@ -44,7 +59,7 @@ async def upload_pdf_legacy(file: UploadFile = File(...)):
     """
     Alias legado para compatibilidad. Redirige al flujo de /audit/pdf.
     """
-    return await audit_single_pdf(file)
+    return await audit_single_pdf(file, mode="standard", budget_ms=None)
 
 # ----------------------------
 # 3) Auditoría batch (opcional)
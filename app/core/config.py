@@ -12,6 +12,21 @@ class Settings(BaseSettings):
     DATA_DIR: str = str(Path(BASE_DIR) / "data" / "pdfs")
     UPLOAD_DIR: str = str(Path(BASE_DIR) / "uploads")
 
+    # Render de páginas (OCR / firma visual): se procesan por ventanas para acotar memoria
+    PDF_MAX_PAGES: int = 60         # páginas analizadas por documento (0 = todas)
+    PDF_RENDER_WINDOW: int = 1      # páginas renderizadas a la vez
+    PDF_RENDER_MAX_MB: int = 64     # techo por ventana; si se supera se baja el DPI (0 = sin techo)
+    PAGE_WORKERS: int = 0           # procesos para OCR/firma por página (0 = en el mismo proceso)
+
+    # Parámetros de firma visual elegidos por app/tools/tune_signature.py (si existe el archivo)
+    SIG_PARAMS_FILE: str = str(Path(BASE_DIR) / "config" / "signature_params.json")
+
+    # Índice de firmas (hash perceptual) para detectar firmas reutilizadas; misma carpeta que el Excel
+    SIG_INDEX_ENABLED: bool = True
+    SIG_INDEX_FILE: str = str(Path(BASE_DIR).parent / "outputs" / "firmas_index.jsonl")
+    SIG_MATCH_MAX_DIST: int = 8     # distancia de Hamming máxima (de 64 bits) para considerar "misma firma"
+    SIG_MATCH_TOP_K: int = 5
+
     class Config:
         env_file = ".env"
 
@@ -1,6 +1,6 @@
 from pathlib import Path
 from datetime import datetime
-from typing import Any, Dict , cast
+from typing import Any, Dict , Iterable, cast
 
 import pandas as pd
 from openpyxl import load_workbook, Workbook
@@ -14,6 +14,9 @@ OUTPUTS_DIR = Path(__file__).resolve().parents[3] / "outputs"
 OUTPUTS_DIR.mkdir(parents=True, exist_ok=True)
 XLSX_PATH = OUTPUTS_DIR / "resultados_auditoria.xlsx"
 
+# Filas de datos que caben en una hoja de Excel (1.048.576 menos el encabezado)
+EXCEL_MAX_ROWS = 1_048_575
+
 # === Esquema fijo de columnas (en orden) ===
 COLUMNS = [
     "timestamp",
@@ -44,6 +47,11 @@ COLUMNS = [
     # Resumen
     "faltantes",
     "observaciones",
+    # Modo / cobertura
+    "modo",
+    "no_verificados",
+    # Firmas reutilizadas (índice de firmas)
+    "firmas_similares",
 ]
 
 # === Helpers visuales ===
@@ -127,13 +135,17 @@ def _auto_format_excel(path: Path) -> None:
             "U": 16,  # cantidad_esperada
             "V": 28,  # faltantes
             "W": 48,  # observaciones
+            "X": 10,  # modo
+            "Y": 28,  # no_verificados
+            "Z": 40,  # firmas_similares
         }
         for col_letter, w in widths.items():
             ws.column_dimensions[col_letter].width = w
 
         # 4) Wrap en columnas largas
         wrap_align = Alignment(wrap_text=True, vertical="top")
-        cols_to_wrap_names = ["ruta", "medicamento_extraido", "medicamento_esperado", "faltantes", "observaciones"]
+        cols_to_wrap_names = ["ruta", "medicamento_extraido", "medicamento_esperado", "faltantes", "observaciones",
+                              "firmas_similares"]
         for name in cols_to_wrap_names:
             if name in COLUMNS:
                 col_idx = COLUMNS.index(name) + 1  # 1-based idx
@@ -149,7 +161,7 @@ def _auto_format_excel(path: Path) -> None:
 
 
 
-def log_result(payload: Dict[str, Any]) -> str:
+def _build_row(payload: Dict[str, Any]) -> Dict[str, Any]:
     """
     payload:
       filename, path, result:{
@@ -157,6 +169,8 @@ def log_result(payload: Dict[str, Any]) -> str:
         cedula, medicamento, fecha, cantidad (bools),
         faltantes(list[str]|str),
         observaciones(str),
+        modo(str), no_verificados(list[str]),
+        firmas_similares(list[{archivo, clave, paciente, distancia, hash}]),
         extraido: { documento, fecha_pedido, medicamento, cantidad },
         comparacion: {
           documento_ok(bool|None),
@@ -179,6 +193,14 @@ def log_result(payload: Dict[str, Any]) -> str:
     else:
         faltantes_txt = str(faltantes_list or "")
 
+    no_verif = r.get("no_verificados", [])
+    no_verif_txt = ", ".join(no_verif) if isinstance(no_verif, list) else str(no_verif or "")
+
+    similares = r.get("firmas_similares", [])
+    similares_txt = ", ".join(
+        f"{s.get('archivo', '')} (d={s.get('distancia', '')})" for s in similares if isinstance(s, dict)
+    ) if isinstance(similares, list) else ""
+
     # Observaciones limpias
     obs = (r.get("observaciones", "") or "").replace("\t", " ").replace("\n", " ").strip()[:500]
 
@@ -216,16 +238,36 @@ def log_result(payload: Dict[str, Any]) -> str:
         # Resumen
         "faltantes": faltantes_txt,
         "observaciones": obs,
+
+        # Modo / cobertura
+        "modo": _safe_get(r, "modo"),
+        "no_verificados": no_verif_txt,
+
+        # Firmas reutilizadas
+        "firmas_similares": similares_txt,
     }
 
-    df_new = pd.DataFrame([row], columns=COLUMNS)
+    return row
+
+
+def log_results(payloads: Iterable[Dict[str, Any]]) -> str:
+    """
+    Registra varios payloads en una sola escritura del Excel (lectura + escritura única).
+    Si un archivo aparece varias veces, se conserva la última fila.
+    """
+    rows = [_build_row(p) for p in payloads]
+    if not rows:
+        return str(XLSX_PATH)
+
+    df_new = pd.DataFrame(rows, columns=COLUMNS)
+    df_new = df_new.drop_duplicates(subset=["archivo"], keep="last")
 
     if XLSX_PATH.exists():
         existing = pd.read_excel(XLSX_PATH)
         existing = _ensure_schema(existing)
 
-        # Evitar duplicados: elimina filas previas del mismo archivo
-        existing = existing[existing["archivo"] != row["archivo"]]
+        # Evitar duplicados: elimina filas previas de los mismos archivos
+        existing = existing[~existing["archivo"].isin(df_new["archivo"])]
 
         df_out = pd.concat([existing, df_new], ignore_index=True)
     else:
@@ -243,9 +285,19 @@ def log_result(payload: Dict[str, Any]) -> str:
     df_out = df_out.sort_values(by=["_archivo_sort", "_ts_sort"], ascending=[True, True], ignore_index=True)
     df_out = df_out.drop(columns=["_archivo_sort", "_ts_sort"], errors="ignore")
     df_out = _ensure_schema(df_out)
+    if len(df_out) > EXCEL_MAX_ROWS:
+        raise ValueError(
+            f"El Excel quedaría con {len(df_out)} filas y una hoja admite {EXCEL_MAX_ROWS}; "
+            "use el consolidado CSV del batch para volúmenes así"
+        )
 
     # Guardar y formatear
     df_out.to_excel(XLSX_PATH, index=False)
     _auto_format_excel(XLSX_PATH)
     return str(XLSX_PATH)
 
+
+def log_result(payload: Dict[str, Any]) -> str:
+    """Registra un payload (reemplaza la fila previa del mismo archivo)."""
+    return log_results([payload])
+
@@ -0,0 +1,431 @@
+"""
+Auditoría offline (batch) de PDFs archivados, fuera de la app FastAPI.
+
+Uso típico (un nodo de 4):
+    python -m app.services.batch_processor --dir /mnt/archivo --shard 0/4
+    python -m app.services.batch_processor --manifest lista.txt --shard 1/4 --workers 16
+    python -m app.services.batch_processor --dir /mnt/archivo --shard 0/4 --retry-errors
+
+Cada shard escribe sus resultados en outputs/batch/shard-<i>-of-<n>.jsonl (una línea
+JSON por PDF, mismo payload que la API). Ese archivo es también el checkpoint: si el
+proceso muere, al relanzar con los mismos argumentos se saltan los PDFs ya auditados.
+
+Al final, los resultados de todos los nodos se consolidan en un CSV (mismas columnas que
+el Excel, una fila por PDF, sin límite de filas); --excel además los vuelca al Excel si caben
+en una hoja (EXCEL_MAX_ROWS):
+    python -m app.services.batch_processor --merge outputs/batch/*.jsonl
+    python -m app.services.batch_processor --merge outputs/batch/*.jsonl --excel
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Set, Tuple
+
+from app.core.config import settings
+from app.services.audit_logger import COLUMNS, EXCEL_MAX_ROWS, OUTPUTS_DIR, _build_row, log_results
+from app.services.pdf_auditor import AUDIT_MODES
+from app.services.pdf_processor import process_path
+from app.services.reference_loader import load_reference
+
+BATCH_DIR = OUTPUTS_DIR / "batch"
+MERGED_CSV = BATCH_DIR / "consolidado.csv"
+
+# Cada cuántos resultados se hace fsync del checkpoint y se reporta throughput
+CHECKPOINT_EVERY = 50
+PROGRESS_EVERY_S = 10.0
+
+
+# =========================
+# Entrada / sharding
+# =========================
+def list_inputs(directory: Optional[str] = None, manifest: Optional[str] = None) -> List[Tuple[str, str]]:
+    """
+    Devuelve [(clave, ruta)] ordenado por clave. La clave es estable entre máquinas:
+    ruta relativa al directorio, o la línea tal cual aparece en el manifiesto.
+    """
+    items: List[Tuple[str, str]] = []
+    if directory:
+        root = Path(directory)
+        for p in root.rglob("*"):
+            if p.is_file() and p.suffix.lower() == ".pdf":
+                items.append((p.relative_to(root).as_posix(), str(p)))
+    if manifest:
+        base = Path(manifest).resolve().parent
+        with open(manifest, "r", encoding="utf-8") as fh:
+            for line in fh:
+                entry = line.strip()
+                if not entry or entry.startswith("#"):
+                    continue
+                p = Path(entry)
+                items.append((entry, str(p if p.is_absolute() else base / p)))
+    items.sort(key=lambda kv: kv[0])
+    return items
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'i/n' -> (i, n), con 0 <= i < n."""
+    try:
+        i_s, n_s = spec.split("/", 1)
+        i, n = int(i_s), int(n_s)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard inválido '{spec}' (formato esperado i/n, ej. 0/4)")
+    if n < 1 or not 0 <= i < n:
+        raise argparse.ArgumentTypeError(f"Shard fuera de rango '{spec}' (requiere 0 <= i < n)")
+    return i, n
+
+
+def positive_int(value: str) -> int:
+    """Entero > 0 (mismo criterio que budget_ms en la API)."""
+    try:
+        n = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Se esperaba un entero, no '{value}'")
+    if n <= 0:
+        raise argparse.ArgumentTypeError(f"Debe ser mayor que 0 (recibido {n})")
+    return n
+
+
+def in_shard(key: str, shard: int, num_shards: int) -> bool:
+    """Asignación determinista (no depende de PYTHONHASHSEED ni del orden de listado)."""
+    return zlib.crc32(key.encode("utf-8")) % num_shards == shard
+
+
+# =========================
+# Checkpoint
+# =========================
+def shard_results_path(out_dir: Path, shard: int, num_shards: int) -> Path:
+    return out_dir / f"shard-{shard}-of-{num_shards}.jsonl"
+
+
+def read_results(path: Path) -> Iterator[Dict[str, Any]]:
+    """Lee un JSONL de resultados ignorando una última línea truncada (proceso muerto a mitad)."""
+    if not path.exists():
+        return
+    with open(path, "r", encoding="utf-8") as fh:
+        for line in fh:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
+
+def load_done_keys(path: Path, include_errors: bool = True) -> Set[str]:
+    """Claves ya auditadas en el checkpoint (opcionalmente solo las exitosas)."""
+    return {
+        str(r.get("key")) for r in read_results(path)
+        if r.get("key") and (include_errors or r.get("status") == "success")
+    }
+
+
+def _truncate_partial_line(path: Path, block: int = 64 * 1024) -> None:
+    """
+    Si el archivo no termina en salto de línea, recorta la última línea incompleta.
+    Busca el último salto leyendo hacia atrás por bloques (el checkpoint puede pesar GB).
+    """
+    if not path.exists() or path.stat().st_size == 0:
+        return
+    with open(path, "rb+") as fh:
+        end = fh.seek(0, os.SEEK_END)
+        fh.seek(end - 1)
+        if fh.read(1) == b"\n":
+            return
+        pos = end
+        cut = 0
+        while pos > 0:
+            start = max(0, pos - block)
+            fh.seek(start)
+            idx = fh.read(pos - start).rfind(b"\n")
+            if idx >= 0:
+                cut = start + idx + 1
+                break
+            pos = start
+        fh.truncate(cut)
+
+
+# =========================
+# Workers
+# =========================
+_REFERENCE: Optional[Dict[str, Dict[str, str]]] = None
+
+
+def _init_worker() -> None:
+    """Carga la tabla de referencia una sola vez por proceso."""
+    global _REFERENCE
+    # El batch ya paraleliza por PDF: sin pool de páginas anidado dentro de cada worker
+    settings.PAGE_WORKERS = 0
+    try:
+        _REFERENCE = load_reference()
+    except Exception:
+        _REFERENCE = {}
+
+
+def _audit_one(key: str, file_path: str, mode: str = "standard", budget_ms: Optional[int] = None) -> Dict[str, Any]:
+    t0 = time.perf_counter()
+    try:
+        payload = process_path(
+            file_path, reference=_REFERENCE, log=False, mode=mode, budget_ms=budget_ms, index_key=key
+        )
+    except Exception as e:
+        payload = {
+            "filename": os.path.basename(file_path),
+            "path": file_path,
+            "result": {"error": f"{e!s}"},
+            "status": "error",
+        }
+    payload["key"] = key
+    payload["elapsed_s"] = round(time.perf_counter() - t0, 3)
+    return payload
+
+
+def _crash_payload(key: str, file_path: str) -> Dict[str, Any]:
+    """Línea de checkpoint para un PDF que tumbó a su proceso worker."""
+    return {
+        "filename": os.path.basename(file_path),
+        "path": file_path,
+        "result": {"error": "El proceso worker murió auditando este PDF (segfault u OOM)"},
+        "status": "error",
+        "key": key,
+    }
+
+
+# =========================
+# Ejecución
+# =========================
+def run_shard(
+    items: List[Tuple[str, str]],
+    shard: int = 0,
+    num_shards: int = 1,
+    out_dir: Path = BATCH_DIR,
+    workers: Optional[int] = None,
+    retry_errors: bool = False,
+    mode: str = "standard",
+    budget_ms: Optional[int] = None,
+    log=print,
+) -> Dict[str, Any]:
+    """
+    Audita los PDFs de `items` que caen en este shard y no están ya en el checkpoint.
+    Con `retry_errors` se vuelven a intentar los que terminaron en error (al consolidar
+    gana la última línea de cada archivo).
+    Si un worker muere, los PDFs en vuelo se reauditan de a uno y el culpable queda como error.
+    Devuelve un resumen {total, ya_hechos, procesados, errores, workers_caidos, segundos, pdfs_por_s}.
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    results_path = shard_results_path(out_dir, shard, num_shards)
+    _truncate_partial_line(results_path)
+
+    done = load_done_keys(results_path, include_errors=not retry_errors)
+    mine = [(k, p) for k, p in items if in_shard(k, shard, num_shards)]
+    pending = [(k, p) for k, p in mine if k not in done]
+    workers = workers or os.cpu_count() or 1
+
+    log(f"[shard {shard}/{num_shards}] {len(mine)} PDFs asignados, "
+        f"{len(mine) - len(pending)} ya auditados, {len(pending)} pendientes, {workers} workers")
+
+    processed = errors = crashes = 0
+    t_start = time.perf_counter()
+    t_report = t_start
+
+    def _new_pool() -> ProcessPoolExecutor:
+        return ProcessPoolExecutor(max_workers=workers, initializer=_init_worker)
+
+    with open(results_path, "a", encoding="utf-8") as out:
+        pool = _new_pool()
+        queue = iter(pending)
+        in_flight: Dict[Future, Tuple[str, str]] = {}
+        max_in_flight = workers * 4  # no encolar millones de futures de una vez
+
+        def _fill() -> None:
+            for k, p in queue:
+                in_flight[pool.submit(_audit_one, k, p, mode, budget_ms)] = (k, p)
+                if len(in_flight) >= max_in_flight:
+                    break
+
+        def _write(payload: Dict[str, Any]) -> None:
+            nonlocal processed, errors
+            out.write(json.dumps(payload, ensure_ascii=False, default=str) + "\n")
+            processed += 1
+            if payload.get("status") != "success":
+                errors += 1
+            if processed % CHECKPOINT_EVERY == 0:
+                out.flush()
+                os.fsync(out.fileno())
+
+        def _isolate(suspects: List[Tuple[str, str]]) -> None:
+            """
+            Un worker murió (segfault de poppler/tesseract, OOM): no se sabe cuál de los PDFs en
+            vuelo lo mató, así que se reauditan de a uno y el que vuelva a tumbar el pool queda
+            como error en el checkpoint (al reanudar no se repite; --retry-errors lo reintenta).
+            """
+            nonlocal pool, crashes
+            for k, p in suspects:
+                try:
+                    payload = pool.submit(_audit_one, k, p, mode, budget_ms).result()
+                except BrokenProcessPool:
+                    crashes += 1
+                    payload = _crash_payload(k, p)
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    pool = _new_pool()
+                _write(payload)
+
+        try:
+            _fill()
+            while in_flight:
+                finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                suspects: List[Tuple[str, str]] = []
+                for fut in finished:
+                    item = in_flight.pop(fut)
+                    try:
+                        payload = fut.result()
+                    except BrokenProcessPool:
+                        suspects.append(item)
+                        continue
+                    _write(payload)
+                if suspects:
+                    # El pool roto hace fallar todo lo que seguía en vuelo
+                    suspects.extend(in_flight.values())
+                    in_flight.clear()
+                    pool.shutdown(wait=False, cancel_futures=True)
+                    log(f"[shard {shard}/{num_shards}] un worker murió; se reauditan de a uno "
+                        f"{len(suspects)} PDFs en vuelo")
+                    pool = _new_pool()
+                    _isolate(suspects)
+                _fill()
+
+                now = time.perf_counter()
+                if now - t_report >= PROGRESS_EVERY_S:
+                    t_report = now
+                    rate = processed / max(1e-9, now - t_start)
+                    eta = (len(pending) - processed) / rate if rate else float("inf")
+                    log(f"[shard {shard}/{num_shards}] {processed}/{len(pending)} "
+                        f"({rate:.2f} PDF/s, errores={errors}, ETA {eta / 60:.1f} min)")
+        finally:
+            pool.shutdown(wait=True, cancel_futures=True)
+            out.flush()
+            os.fsync(out.fileno())
+
+    elapsed = time.perf_counter() - t_start
+    summary = {
+        "total": len(mine),
+        "ya_hechos": len(mine) - len(pending),
+        "procesados": processed,
+        "errores": errors,
+        "workers_caidos": crashes,
+        "segundos": round(elapsed, 2),
+        "pdfs_por_s": round(processed / elapsed, 3) if elapsed > 0 else 0.0,
+        "resultados": str(results_path),
+    }
+    log(f"[shard {shard}/{num_shards}] listo: {summary}")
+    return summary
+
+
+def _result_key(payload: Dict[str, Any]) -> str:
+    return str(payload.get("key") or payload.get("path") or payload.get("filename") or "")
+
+
+def merge_results(paths: Iterable[str], out_csv: Path = MERGED_CSV, excel: bool = False) -> Dict[str, Any]:
+    """
+    Consolida los JSONL de uno o varios shards en `out_csv`, en streaming (dos pasadas: la
+    primera solo guarda qué línea es la última de cada PDF, la segunda escribe esas filas).
+    Con `excel`, también se vuelcan al Excel; falla antes de cargar nada si no caben en una hoja.
+    Devuelve {filas, csv, excel}.
+    """
+    paths = [Path(p) for p in paths]
+
+    # 1) Última aparición de cada PDF (gana el reintento más reciente)
+    last: Dict[str, int] = {}
+    seq = 0
+    for p in paths:
+        for payload in read_results(p):
+            last[_result_key(payload)] = seq
+            seq += 1
+    winners = set(last.values())
+    n_rows = len(winners)
+    del last
+
+    if excel and n_rows > EXCEL_MAX_ROWS:
+        raise ValueError(
+            f"{n_rows} PDFs no caben en una hoja de Excel (máximo {EXCEL_MAX_ROWS}); "
+            "use el consolidado CSV sin --excel"
+        )
+
+    # 2) Escritura en streaming del consolidado
+    out_csv.parent.mkdir(parents=True, exist_ok=True)
+    tmp = out_csv.with_suffix(out_csv.suffix + ".tmp")
+    seq = 0
+    with open(tmp, "w", encoding="utf-8-sig", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=COLUMNS)
+        writer.writeheader()
+        for p in paths:
+            for payload in read_results(p):
+                if seq in winners:
+                    writer.writerow(_build_row(payload))
+                seq += 1
+    os.replace(tmp, out_csv)
+
+    xlsx = None
+    if excel:
+        seq = 0
+        payloads: List[Dict[str, Any]] = []
+        for p in paths:
+            for payload in read_results(p):
+                if seq in winners:
+                    payloads.append(payload)
+                seq += 1
+        xlsx = log_results(payloads)
+    return {"filas": n_rows, "csv": str(out_csv), "excel": xlsx}
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(
+        prog="python -m app.services.batch_processor",
+        description="Auditoría offline de PDFs (reanudable y particionable por shards).",
+    )
+    src = parser.add_mutually_exclusive_group(required=True)
+    src.add_argument("--dir", help="Directorio con PDFs (recursivo)")
+    src.add_argument("--manifest", help="Archivo de texto con una ruta de PDF por línea")
+    src.add_argument("--merge", nargs="+", metavar="JSONL", help="Consolida resultados de shards en un CSV")
+    parser.add_argument("--merged-csv", default=str(MERGED_CSV), help=f"Salida de --merge (default {MERGED_CSV})")
+    parser.add_argument("--excel", action="store_true",
+                        help=f"Con --merge, vuelca también al Excel (hasta {EXCEL_MAX_ROWS} filas)")
+    parser.add_argument("--shard", type=parse_shard, default=(0, 1), help="Partición i/n de este nodo (default 0/1)")
+    parser.add_argument("--out", default=str(BATCH_DIR), help=f"Directorio de resultados (default {BATCH_DIR})")
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: todos los núcleos)")
+    parser.add_argument("--retry-errors", action="store_true", help="Reintenta los PDFs que fallaron en corridas previas")
+    parser.add_argument("--mode", choices=AUDIT_MODES, default="standard", help="Modo de auditoría (default standard)")
+    parser.add_argument("--budget-ms", type=positive_int, default=None, help="Presupuesto de tiempo por PDF en ms (> 0)")
+    args = parser.parse_args(argv)
+
+    if args.merge:
+        try:
+            merged = merge_results(args.merge, Path(args.merged_csv), excel=args.excel)
+        except ValueError as e:
+            print(f"Error: {e}", file=sys.stderr)
+            return 2
+        print(json.dumps(merged, ensure_ascii=False))
+        return 0
+
+    def _log(msg: str) -> None:
+        print(msg, file=sys.stderr, flush=True)
+
+    items = list_inputs(directory=args.dir, manifest=args.manifest)
+    shard, num_shards = args.shard
+    summary = run_shard(
+        items, shard, num_shards, Path(args.out), args.workers,
+        retry_errors=args.retry_errors, mode=args.mode, budget_ms=args.budget_ms, log=_log,
+    )
+    print(json.dumps(summary, ensure_ascii=False))
+    return 0 if summary["errores"] == 0 else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
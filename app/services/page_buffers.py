@@ -0,0 +1,162 @@
+"""
+Traspaso de páginas renderizadas a procesos worker sin serializar los píxeles.
+
+El proceso padre copia cada raster a un bloque de multiprocessing.shared_memory (la única
+copia de página completa: las imágenes PIL se vuelcan por franjas, sin un bytes intermedio
+del tamaño de la página) y al worker solo le llega un descriptor (nombre, forma, dtype: unos
+cientos de bytes en vez de ~3.7 MB por página a 200 DPI). El worker lo adjunta como vista
+NumPy sin copiar.
+
+Los bloques se liberan siempre: PageArena los desvincula (unlink) al salir del `with`
+aunque haya excepciones, y un atexit recoge lo que quede si el proceso termina antes.
+"""
+import atexit
+import threading
+from dataclasses import dataclass
+from multiprocessing import shared_memory
+from typing import Any, Callable, Dict, Tuple, TypeVar
+
+import numpy as np
+from PIL import Image
+
+T = TypeVar("T")
+
+# Filas por franja al volcar una imagen PIL (acota lo transitorio a ~STRIP_ROWS * ancho bytes)
+STRIP_ROWS = 256
+
+
+@dataclass(frozen=True)
+class SharedPage:
+    """Descriptor picklable de una página en memoria compartida."""
+    name: str
+    shape: Tuple[int, ...]
+    dtype: str = "uint8"
+
+
+# Bloques creados por este proceso y aún no liberados (red de seguridad para atexit)
+_LIVE: Dict[str, shared_memory.SharedMemory] = {}
+_LIVE_LOCK = threading.Lock()
+
+
+def _release(name: str) -> None:
+    with _LIVE_LOCK:
+        shm = _LIVE.pop(name, None)
+    if shm is None:
+        return
+    try:
+        shm.close()
+    except BufferError:
+        pass  # queda una vista viva; el mapeo se suelta al recolectarla, el nombre se borra igual
+    try:
+        shm.unlink()
+    except FileNotFoundError:
+        pass
+
+
+@atexit.register
+def _release_all() -> None:
+    for name in list(_LIVE):
+        _release(name)
+
+
+def live_blocks() -> int:
+    """Cantidad de bloques de este proceso aún no liberados (para pruebas/diagnóstico)."""
+    return len(_LIVE)
+
+
+class PageArena:
+    """
+    Dueño de los bloques compartidos de una auditoría:
+
+        with PageArena() as arena:
+            desc = arena.put_image(page)
+            pool.submit(worker_fn, desc)
+        # aquí todos los bloques ya están liberados
+    """
+
+    def __init__(self):
+        self._names: Dict[str, SharedPage] = {}
+
+    def _alloc(self, shape: Tuple[int, ...], dtype: np.dtype) -> Tuple[SharedPage, np.ndarray]:
+        nbytes = int(np.prod(shape)) * dtype.itemsize
+        shm = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        with _LIVE_LOCK:
+            _LIVE[shm.name] = shm
+        return SharedPage(shm.name, tuple(shape), dtype.str), np.ndarray(shape, dtype=dtype, buffer=shm.buf)
+
+    def put(self, array: np.ndarray) -> SharedPage:
+        """Copia `array` a un bloque nuevo (única copia) y devuelve su descriptor."""
+        desc, dst = self._alloc(array.shape, array.dtype)
+        try:
+            dst[...] = array
+        except Exception:
+            del dst
+            _release(desc.name)
+            raise
+        del dst
+        self._names[desc.name] = desc
+        return desc
+
+    def put_image(self, im: Image.Image, strip_rows: int = STRIP_ROWS) -> SharedPage:
+        """
+        Vuelca una imagen PIL en escala de grises ('L') a un bloque nuevo por franjas: np.asarray(im)
+        ya materializa la página entera en un bytes intermedio, y aquí lo transitorio es una franja.
+        """
+        if im.mode != "L":
+            raise ValueError(f"Se esperaba una imagen en escala de grises ('L'), no '{im.mode}'")
+        w, h = im.size
+        desc, dst = self._alloc((h, w), np.dtype(np.uint8))
+        try:
+            for y0 in range(0, h, strip_rows):
+                y1 = min(h, y0 + strip_rows)
+                strip = im.crop((0, y0, w, y1))
+                dst[y0:y1] = np.asarray(strip)
+                strip.close()
+        except Exception:
+            del dst
+            _release(desc.name)
+            raise
+        del dst
+        self._names[desc.name] = desc
+        return desc
+
+    def view(self, desc: SharedPage) -> np.ndarray:
+        """Vista (sin copia) de un bloque propio; no debe sobrevivir a free()/close()."""
+        with _LIVE_LOCK:
+            shm = _LIVE[desc.name]
+        return np.ndarray(desc.shape, dtype=np.dtype(desc.dtype), buffer=shm.buf)
+
+    def free(self, desc: SharedPage) -> None:
+        """Libera un bloque en cuanto el worker terminó con él (acota memoria en documentos largos)."""
+        if self._names.pop(desc.name, None) is not None:
+            _release(desc.name)
+
+    def close(self) -> None:
+        for name in list(self._names):
+            self._names.pop(name, None)
+            _release(name)
+
+    def __enter__(self) -> "PageArena":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def run_on_page(desc: SharedPage, fn: Callable[..., T], *args: Any) -> T:
+    """
+    En el worker: adjunta el bloque, llama fn(vista, *args) sin copiar píxeles y cierra
+    (no desvincula: eso le toca al padre). fn debe devolver datos propios, no vistas.
+    """
+    shm = shared_memory.SharedMemory(name=desc.name)
+    try:
+        view = np.ndarray(desc.shape, dtype=np.dtype(desc.dtype), buffer=shm.buf)
+        try:
+            return fn(view, *args)
+        finally:
+            del view
+    finally:
+        try:
+            shm.close()
+        except BufferError:
+            pass  # fn retuvo una vista; el mapeo se suelta al recolectarla
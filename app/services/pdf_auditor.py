@@ -1,8 +1,22 @@
+import json
+import logging
+import math
 import re
-from typing import List, Optional, Tuple
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, Iterator, List, Optional, Sequence, Tuple
 
 import pdfplumber
-from pdf2image import convert_from_path
+from pdf2image import convert_from_path, pdfinfo_from_path
+from pdf2image.exceptions import (
+    PDFInfoNotInstalledError,
+    PDFPageCountError,
+    PDFPopplerTimeoutError,
+    PDFSyntaxError,
+    PopplerNotInstalledError,
+)
 from PIL import Image
 import pytesseract
 
@@ -10,6 +24,12 @@ import pytesseract
 import numpy as np
 import cv2
 
+from app.core.config import settings
+from app.services.page_buffers import PageArena, SharedPage, run_on_page
+from app.services.signature_index import signature_hash
+
+logger = logging.getLogger(__name__)
+
 # === RUTAS LOCALES (ajusta si es necesario) ===
 # pytesseract.pytesseract.tesseract_cmd = r"C:\Program Files\Tesseract-OCR\tesseract.exe"
 POPPLER_PATH = r"C:\poppler\Library\bin"
@@ -22,6 +42,310 @@ SIG_MIN_STROKES  = 5
 SIG_MIN_COMPLEX  = 15
 SIG_MAX_COMPLEX  = 1100
 
+# Sobrescritura opcional desde JSON (lo escribe app/tools/tune_signature.py --write-best)
+SIG_PARAM_KEYS = ("SIG_ROI_BANDS", "SIG_MIN_AREA", "SIG_MAX_AREA", "SIG_MIN_STROKES", "SIG_MIN_COMPLEX", "SIG_MAX_COMPLEX")
+
+
+def _number(data: Dict[str, Any], key: str, minimum: float) -> float:
+    v = data[key]
+    if isinstance(v, bool) or not isinstance(v, (int, float)) or not math.isfinite(v) or v < minimum:
+        raise ValueError(f"{key} debe ser un número >= {minimum} (recibido {v!r})")
+    return v
+
+
+def _validate_sig_params(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Valida tipos y rangos de los SIG_* presentes en `data`; ValueError si algo no cuadra."""
+    params: Dict[str, Any] = {}
+    if "SIG_ROI_BANDS" in data:
+        bands = data["SIG_ROI_BANDS"]
+        if not isinstance(bands, list) or not bands:
+            raise ValueError("SIG_ROI_BANDS debe ser una lista no vacía de [inicio, fin]")
+        params["SIG_ROI_BANDS"] = []
+        for b in bands:
+            if (not isinstance(b, (list, tuple)) or len(b) != 2
+                    or any(isinstance(x, bool) or not isinstance(x, (int, float)) for x in b)
+                    or not 0.0 <= b[0] < b[1] <= 1.0):
+                raise ValueError(f"banda inválida en SIG_ROI_BANDS: {b!r} (requiere 0 <= inicio < fin <= 1)")
+            params["SIG_ROI_BANDS"].append((float(b[0]), float(b[1])))
+    for key in ("SIG_MIN_AREA", "SIG_MAX_AREA", "SIG_MIN_COMPLEX", "SIG_MAX_COMPLEX"):
+        if key in data:
+            params[key] = _number(data, key, 0)
+    if "SIG_MIN_STROKES" in data:
+        if _number(data, "SIG_MIN_STROKES", 1) != int(data["SIG_MIN_STROKES"]):
+            raise ValueError("SIG_MIN_STROKES debe ser entero")
+        params["SIG_MIN_STROKES"] = int(data["SIG_MIN_STROKES"])
+    for lo, hi in (("SIG_MIN_AREA", "SIG_MAX_AREA"), ("SIG_MIN_COMPLEX", "SIG_MAX_COMPLEX")):
+        lo_v, hi_v = params.get(lo, globals()[lo]), params.get(hi, globals()[hi])
+        if lo_v > hi_v:
+            raise ValueError(f"{lo} ({lo_v}) no puede superar {hi} ({hi_v})")
+    return params
+
+
+def _load_sig_params(path: str) -> Dict[str, Any]:
+    """
+    SIG_* validados desde el JSON; {} si no existe. Si el archivo es inválido se registra
+    y se usan los valores por defecto completos (no se mezcla una configuración a medias).
+    """
+    try:
+        with open(path, "r", encoding="utf-8") as fh:
+            data = json.load(fh)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        logger.warning("No se pudo leer %s (%s); se usan los parámetros de firma por defecto", path, e)
+        return {}
+    try:
+        if not isinstance(data, dict):
+            raise ValueError("se esperaba un objeto JSON")
+        return _validate_sig_params({k: data[k] for k in SIG_PARAM_KEYS if k in data})
+    except ValueError as e:
+        logger.warning("Parámetros de firma inválidos en %s (%s); se usan los valores por defecto", path, e)
+        return {}
+
+
+_SIG_PARAMS = _load_sig_params(settings.SIG_PARAMS_FILE)
+SIG_ROI_BANDS    = _SIG_PARAMS.get("SIG_ROI_BANDS", SIG_ROI_BANDS)
+SIG_MIN_AREA     = _SIG_PARAMS.get("SIG_MIN_AREA", SIG_MIN_AREA)
+SIG_MAX_AREA     = _SIG_PARAMS.get("SIG_MAX_AREA", SIG_MAX_AREA)
+SIG_MIN_STROKES  = _SIG_PARAMS.get("SIG_MIN_STROKES", SIG_MIN_STROKES)
+SIG_MIN_COMPLEX  = _SIG_PARAMS.get("SIG_MIN_COMPLEX", SIG_MIN_COMPLEX)
+SIG_MAX_COMPLEX  = _SIG_PARAMS.get("SIG_MAX_COMPLEX", SIG_MAX_COMPLEX)
+
+# === Render de páginas ===
+RENDER_DPI       = 200
+RENDER_MIN_DPI   = 72      # piso al bajar DPI por el techo de memoria
+
+# === Modos de auditoría ===
+# fast: capa de texto + objetos del PDF (sin OCR ni render) | standard: flujo completo
+# thorough: como standard, con más DPI y bandas ROI adicionales
+AUDIT_MODES = ("fast", "standard", "thorough")
+MODE_DPI = {"fast": RENDER_DPI, "standard": RENDER_DPI, "thorough": 300}
+SIG_ROI_BANDS_THOROUGH = SIG_ROI_BANDS + [(0.40, 0.75), (0.80, 1.00)]
+
+# Estados reportados en result["checks"]
+CHECK_OK        = "ok"
+CHECK_NO_REQ    = "no_requerido"          # no hizo falta (p. ej. firma ya hallada por texto)
+CHECK_OMIT_MODE = "omitido_por_modo"
+CHECK_OMIT_TIME = "omitido_por_tiempo"
+CHECK_PARTIAL   = "parcial_por_tiempo"    # se cortó a mitad de páginas
+CHECK_ERROR     = "error"                 # la etapa falló (render/OpenCV): no equivale a "no hallado"
+CHECK_LIMITED   = "parcial_por_limites"   # páginas sin analizar (PDF_MAX_PAGES) o DPI reducido (PDF_RENDER_MAX_MB)
+
+# Estados con los que un "no detectado" no es concluyente
+_INCOMPLETE = (CHECK_OMIT_MODE, CHECK_OMIT_TIME, CHECK_PARTIAL, CHECK_ERROR, CHECK_LIMITED)
+
+# Fallas esperables al renderizar/analizar páginas (poppler ausente, PDF dañado, OpenCV,
+# o un worker del pool de páginas que murió)
+_RENDER_ERRORS = (
+    PDFInfoNotInstalledError, PDFPageCountError, PDFPopplerTimeoutError, PDFSyntaxError,
+    PopplerNotInstalledError, cv2.error, OSError, ValueError, BrokenProcessPool,
+)
+
+
+class _Deadline:
+    """Presupuesto de tiempo de una auditoría. `hit` queda en True si se consultó ya vencido."""
+
+    def __init__(self, budget_ms: Optional[int] = None):
+        self.t_end = time.monotonic() + budget_ms / 1000.0 if budget_ms else None
+        self.hit = False
+
+    def expired(self) -> bool:
+        if self.t_end is not None and time.monotonic() >= self.t_end:
+            self.hit = True
+        return self.hit
+
+    def timeout_s(self) -> Optional[float]:
+        """Segundos restantes para pasar como timeout a poppler/tesseract (None = sin presupuesto)."""
+        return _timeout_until(self.t_end)
+
+
+def _timeout_until(t_end: Optional[float]) -> Optional[float]:
+    # Nunca 0: pytesseract interpreta 0 como "sin timeout". time.monotonic es común a los
+    # procesos de la máquina, así que t_end también sirve dentro de los workers.
+    return None if t_end is None else max(0.001, t_end - time.monotonic())
+
+
+class _RenderReport:
+    """
+    Lo que _iter_pages no pudo renderizar tal como se pidió: páginas omitidas por PDF_MAX_PAGES
+    y ventanas a menos DPI por el techo de memoria. `limited` => el análisis no es concluyente.
+    """
+
+    def __init__(self):
+        self.paginas_omitidas = 0
+        self.dpi_pedido: Optional[int] = None
+        self.dpi_min: Optional[int] = None
+
+    def note_dpi(self, requested: int, used: int) -> None:
+        self.dpi_pedido = requested
+        self.dpi_min = used if self.dpi_min is None else min(self.dpi_min, used)
+
+    @property
+    def dpi_reducido(self) -> bool:
+        return self.dpi_min is not None and self.dpi_pedido is not None and self.dpi_min < self.dpi_pedido
+
+    @property
+    def limited(self) -> bool:
+        return self.paginas_omitidas > 0 or self.dpi_reducido
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {"paginas_omitidas": self.paginas_omitidas, "dpi_pedido": self.dpi_pedido, "dpi_min": self.dpi_min}
+
+
+# =========================
+# Render de páginas (streaming)
+# =========================
+def _page_sizes_pts(info: Dict[str, Any], n_pages: int) -> List[Tuple[float, float]]:
+    """Tamaños (ancho, alto) en puntos por página según pdfinfo; (0, 0) si no se conoce."""
+    default = (0.0, 0.0)
+    m = re.match(r"([\d.]+)\s*x\s*([\d.]+)", str(info.get("Page size", "")))
+    if m:
+        default = (float(m.group(1)), float(m.group(2)))
+    sizes = [default] * n_pages
+    for key, val in info.items():
+        km = re.match(r"Page\s+(\d+)\s+size", key)
+        vm = re.match(r"([\d.]+)\s*x\s*([\d.]+)", str(val))
+        if km and vm and 1 <= int(km.group(1)) <= n_pages:
+            sizes[int(km.group(1)) - 1] = (float(vm.group(1)), float(vm.group(2)))
+    return sizes
+
+
+def _dpi_within_budget(sizes_pts: List[Tuple[float, float]], dpi: int, max_bytes: int) -> int:
+    """Baja el DPI si la ventana (en escala de grises, 1 byte/px) superaría el techo de memoria."""
+    if max_bytes <= 0:
+        return dpi
+    area_in2 = sum((w / 72.0) * (h / 72.0) for w, h in sizes_pts)
+    needed = area_in2 * dpi * dpi
+    if needed <= max_bytes:
+        return dpi
+    return max(RENDER_MIN_DPI, int(dpi * math.sqrt(max_bytes / needed)))
+
+
+def _page_dpi(im: Image.Image, default: int) -> int:
+    """DPI con que _iter_pages renderizó la página (puede ser menor que el pedido)."""
+    return int(im.info.get("render_dpi", default))
+
+
+def _iter_pages(
+    file_path: str,
+    dpi: int = RENDER_DPI,
+    report: Optional[_RenderReport] = None,
+    deadline: Optional[_Deadline] = None,
+) -> Iterator[Image.Image]:
+    """
+    Renderiza el PDF por ventanas de PDF_RENDER_WINDOW páginas (escala de grises) y libera
+    cada ventana antes de pasar a la siguiente, en vez de materializar todo el documento.
+    Respeta PDF_MAX_PAGES (páginas a analizar) y PDF_RENDER_MAX_MB (techo por ventana).
+    Cada imagen lleva su DPI real en info["render_dpi"]; las páginas omitidas y las bajas
+    de DPI quedan en `report`. Con `deadline`, poppler recibe el tiempo restante como timeout
+    y, si se agota a mitad de un render, se corta la iteración con deadline.hit = True.
+    """
+    max_pages = settings.PDF_MAX_PAGES
+    if deadline is not None and deadline.expired():
+        return
+    try:
+        info = pdfinfo_from_path(
+            file_path, poppler_path=POPPLER_PATH,
+            first_page=1, last_page=max_pages if max_pages > 0 else None,
+            timeout=deadline.timeout_s() if deadline is not None else None,
+        )
+    except PDFPopplerTimeoutError:
+        if deadline is None:
+            raise
+        deadline.hit = True
+        return
+    total = int(info.get("Pages", 0))
+    n_pages = min(total, max_pages) if max_pages > 0 else total
+    if report is not None:
+        report.paginas_omitidas = total - n_pages
+    sizes = _page_sizes_pts(info, n_pages)
+
+    window = max(1, settings.PDF_RENDER_WINDOW)
+    max_bytes = settings.PDF_RENDER_MAX_MB * 1024 * 1024
+    for first in range(1, n_pages + 1, window):
+        last = min(n_pages, first + window - 1)
+        win_dpi = _dpi_within_budget(sizes[first - 1:last], dpi, max_bytes)
+        if report is not None:
+            report.note_dpi(dpi, win_dpi)
+        if deadline is not None and deadline.expired():
+            return
+        try:
+            batch: List[Image.Image] = convert_from_path(
+                file_path, dpi=win_dpi, first_page=first, last_page=last,
+                grayscale=True, poppler_path=POPPLER_PATH,
+                timeout=deadline.timeout_s() if deadline is not None else None,
+            )
+        except PDFPopplerTimeoutError:
+            if deadline is None:
+                raise
+            deadline.hit = True
+            return
+        try:
+            for i, im in enumerate(batch):
+                if im.mode != "L":
+                    batch[i] = im = im.convert("L")
+                im.info["render_dpi"] = win_dpi
+                yield im
+        finally:
+            for im in batch:
+                im.close()
+            batch.clear()
+
+
+# =========================
+# Pool de páginas (OCR / firma en otros procesos)
+# =========================
+_PAGE_POOL: Optional[ProcessPoolExecutor] = None
+
+
+def _page_pool() -> Optional[ProcessPoolExecutor]:
+    """Pool compartido para trabajo por página; None si PAGE_WORKERS <= 0 (todo en proceso)."""
+    global _PAGE_POOL
+    if settings.PAGE_WORKERS <= 0:
+        return None
+    if _PAGE_POOL is None:
+        _PAGE_POOL = ProcessPoolExecutor(max_workers=settings.PAGE_WORKERS)
+    return _PAGE_POOL
+
+
+def _map_pages(
+    file_path: str, dpi: int, fn, *args,
+    deadline: Optional[_Deadline] = None, report: Optional[_RenderReport] = None,
+):
+    """
+    Renderiza en streaming y reparte cada página a los workers vía memoria compartida
+    (solo viaja el descriptor); el worker corre fn(página, *args, dpi_real). Produce (arena, descriptor, resultado) en orden de página;
+    mientras el consumidor tiene el turno, la página sigue viva en la arena. En vuelo hay a
+    lo sumo PAGE_WORKERS + 1 páginas, y todos los bloques se liberan al terminar o cortar.
+    """
+    global _PAGE_POOL
+    pool = _page_pool()
+    pending: deque = deque()
+    with PageArena() as arena:
+        try:
+            for im in _iter_pages(file_path, dpi=dpi, report=report, deadline=deadline):
+                if deadline is not None and deadline.expired():
+                    break
+                desc: SharedPage = arena.put_image(im)
+                pending.append((desc, pool.submit(run_on_page, desc, fn, *args, _page_dpi(im, dpi))))
+                if len(pending) > settings.PAGE_WORKERS:
+                    done_desc, fut = pending.popleft()
+                    yield arena, done_desc, fut.result()
+                    arena.free(done_desc)
+            while pending:
+                done_desc, fut = pending.popleft()
+                yield arena, done_desc, fut.result()
+                arena.free(done_desc)
+        except BrokenProcessPool:
+            # Un worker murió: se descarta el pool (se recrea en la próxima auditoría)
+            if _PAGE_POOL is pool:
+                _PAGE_POOL = None
+            pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            for _, fut in pending:
+                fut.cancel()
+
 
 # =========================
 # Helpers de texto / OCR
@@ -57,12 +381,55 @@ def _extract_text_pdfplumber(file_path: str) -> str:
     return _normalize_text(" ".join(chunks))
 
 
-def _extract_text_ocr(file_path: str) -> str:
-    pages: List[Image.Image] = convert_from_path(file_path, dpi=200, poppler_path=POPPLER_PATH)
+def _is_tesseract_timeout(e: RuntimeError) -> bool:
+    return "timeout" in str(e).lower()
+
+
+def _ocr_array(gray: np.ndarray, t_end: Optional[float] = None, dpi: int = RENDER_DPI) -> Optional[str]:
+    """OCR de una página en un worker; None si se agotó el presupuesto (t_end, reloj monotónico)."""
+    try:
+        return pytesseract.image_to_string(
+            Image.fromarray(gray), lang="spa+eng", config=f"--dpi {dpi}", timeout=_timeout_until(t_end) or 0,
+        )
+    except RuntimeError as e:
+        if t_end is None or not _is_tesseract_timeout(e):
+            raise
+        return None
+
+
+def _extract_text_ocr(
+    file_path: str,
+    dpi: int = RENDER_DPI,
+    deadline: Optional[_Deadline] = None,
+    report: Optional[_RenderReport] = None,
+) -> str:
+    """
+    OCR página a página. Con `deadline`, tesseract recibe el tiempo restante como timeout; si
+    se agota se conserva lo ya leído y queda deadline.hit = True.
+    """
     parts: List[str] = []
-    for im in pages:
-        im = im.convert("L")
-        parts.append(pytesseract.image_to_string(im, lang="spa+eng"))
+    if _page_pool() is not None:
+        t_end = deadline.t_end if deadline is not None else None
+        for _, _, txt in _map_pages(file_path, dpi, _ocr_array, t_end, deadline=deadline, report=report):
+            if txt is None:
+                deadline.hit = True
+                break
+            parts.append(txt)
+        return _normalize_text(" ".join(parts))
+
+    for im in _iter_pages(file_path, dpi=dpi, report=report, deadline=deadline):
+        if deadline is not None and deadline.expired():
+            break
+        try:
+            parts.append(pytesseract.image_to_string(
+                im, lang="spa+eng", config=f"--dpi {_page_dpi(im, dpi)}",
+                timeout=(deadline.timeout_s() if deadline is not None else None) or 0,
+            ))
+        except RuntimeError as e:
+            if deadline is None or not _is_tesseract_timeout(e):
+                raise
+            deadline.hit = True
+            break
     return _normalize_text(" ".join(parts))
 
 
@@ -116,72 +483,249 @@ def _find_medicamento(text: str) -> bool:
 # =========================
 # Firma visual (OpenCV)
 # =========================
-def _has_signature_visual(file_path: str) -> bool:
+def _has_signature_objects(file_path: str, top_frac: float = SIG_ROI_BANDS[0][0]) -> bool:
+    """
+    Chequeo barato sin render: busca en la parte baja de cada página objetos del PDF
+    que suelen ser una firma (imagen incrustada pequeña o trazos vectoriales/curvas).
+    """
     try:
-        pages: List[Image.Image] = convert_from_path(file_path, dpi=200, poppler_path=POPPLER_PATH)
-        for im in pages:
-            w, h = im.size
-            gray_full = np.array(im.convert("L"))
-
-            for (top_frac, bot_frac) in SIG_ROI_BANDS:
-                y1, y2 = int(h * top_frac), int(h * bot_frac)
-                x1, x2 = int(w * 0.05), int(w * 0.95)
-                roi = gray_full[y1:y2, x1:x2]
-
-                roi_blur = cv2.GaussianBlur(roi, (5, 5), 0)
-                _, th_otsu = cv2.threshold(roi_blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
-                th_adapt = cv2.adaptiveThreshold(
-                    roi_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 35, 10
-                )
-
-                for th in (th_otsu, th_adapt):
-                    kernel_h = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, th.shape[1] // 18), 1))
-                    th_nolines = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel_h, iterations=1)
-                    kernel_s = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-                    th_clean = cv2.morphologyEx(th_nolines, cv2.MORPH_OPEN, kernel_s, iterations=1)
-
-                    cnts, _ = cv2.findContours(th_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-                    stroke_like = 0
-                    for c in cnts:
-                        area = cv2.contourArea(c)
-                        if area < SIG_MIN_AREA or area > SIG_MAX_AREA:
-                            continue
-                        _, _, cw, ch = cv2.boundingRect(c)
-                        aspect = cw / max(1, ch)
-                        if aspect > 22 and ch < 6:
-                            continue
-                        peri = cv2.arcLength(c, True) or 1.0
-                        comp = (peri * peri) / max(1.0, area)
-                        if SIG_MIN_COMPLEX < comp < SIG_MAX_COMPLEX:
-                            stroke_like += 1
-
-                    if stroke_like >= SIG_MIN_STROKES:
+        with pdfplumber.open(file_path) as pdf:
+            for p in pdf.pages:
+                y_min = float(p.height) * top_frac
+                page_area = float(p.width) * float(p.height) or 1.0
+                for img in p.images:
+                    area = (img["x1"] - img["x0"]) * (img["bottom"] - img["top"])
+                    if img["top"] >= y_min and area < page_area * 0.25:
                         return True
-
+                curves = [c for c in p.curves if c["top"] >= y_min]
+                if len(curves) >= 2:
+                    return True
         return False
     except Exception:
         return False
 
 
-def _find_firma(text: str, file_path: str) -> Tuple[bool, Optional[str]]:
+def _clean_contours(th: np.ndarray) -> Sequence[np.ndarray]:
+    """Quita renglones horizontales y ruido fino del binarizado y devuelve sus contornos externos."""
+    kernel_h = cv2.getStructuringElement(cv2.MORPH_RECT, (max(15, th.shape[1] // 18), 1))
+    th_nolines = cv2.morphologyEx(th, cv2.MORPH_OPEN, kernel_h, iterations=1)
+    kernel_s = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
+    th_clean = cv2.morphologyEx(th_nolines, cv2.MORPH_OPEN, kernel_s, iterations=1)
+    cnts, _ = cv2.findContours(th_clean, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return cnts
+
+
+def _iter_roi_contours(
+    gray_full: np.ndarray, band: Tuple[float, float]
+) -> Iterator[Tuple[Sequence[np.ndarray], int, int]]:
+    """
+    Umbraliza la banda ROI y produce (contornos, x_off, y_off) primero con Otsu y luego con
+    umbral adaptativo. Es perezoso: si el consumidor corta tras Otsu, el adaptativo (y su
+    morfología y findContours) no se calcula.
+    """
+    h, w = gray_full.shape[:2]
+    top_frac, bot_frac = band
+    y1, y2 = int(h * top_frac), int(h * bot_frac)
+    x1, x2 = int(w * 0.05), int(w * 0.95)
+    roi = gray_full[y1:y2, x1:x2]
+
+    roi_blur = cv2.GaussianBlur(roi, (5, 5), 0)
+    _, th_otsu = cv2.threshold(roi_blur, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+    yield _clean_contours(th_otsu), x1, y1
+
+    th_adapt = cv2.adaptiveThreshold(
+        roi_blur, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY_INV, 35, 10
+    )
+    yield _clean_contours(th_adapt), x1, y1
+
+
+def _contour_features(
+    cnts: Sequence[np.ndarray],
+    x_off: int,
+    y_off: int,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+) -> np.ndarray:
+    """
+    Matriz (n, 6) con [área, x, y, ancho, alto, complejidad] por contorno. Con min_area/max_area
+    solo se miden (boundingRect/arcLength) los contornos dentro del rango de área.
+    """
+    rows = []
+    for c in cnts:
+        area = cv2.contourArea(c)
+        if (min_area is not None and area < min_area) or (max_area is not None and area > max_area):
+            continue
+        cx, cy, cw, ch = cv2.boundingRect(c)
+        peri = cv2.arcLength(c, True) or 1.0
+        rows.append((area, x_off + cx, y_off + cy, cw, ch, (peri * peri) / max(1.0, area)))
+    return np.array(rows, dtype=np.float64).reshape(-1, 6)
+
+
+def _roi_contour_features(gray_full: np.ndarray, band: Tuple[float, float]) -> List[np.ndarray]:
+    """
+    Rasgos de TODOS los contornos de la banda, por umbral (Otsu, adaptativo). Lo usa el
+    ajuste de parámetros (app/tools/tune_signature.py); el filtro barato es _stroke_mask.
+    """
+    return [_contour_features(cnts, x1, y1) for cnts, x1, y1 in _iter_roi_contours(gray_full, band)]
+
+
+def _stroke_mask(
+    feats: np.ndarray,
+    min_area: Optional[float] = None,
+    max_area: Optional[float] = None,
+    min_complex: Optional[float] = None,
+    max_complex: Optional[float] = None,
+) -> np.ndarray:
+    """Máscara de contornos 'tipo trazo' (mismos filtros que el detector en vivo)."""
+    min_area = SIG_MIN_AREA if min_area is None else min_area
+    max_area = SIG_MAX_AREA if max_area is None else max_area
+    min_complex = SIG_MIN_COMPLEX if min_complex is None else min_complex
+    max_complex = SIG_MAX_COMPLEX if max_complex is None else max_complex
+
+    area, cw, ch, comp = feats[:, 0], feats[:, 3], feats[:, 4], feats[:, 5]
+    ok = (area >= min_area) & (area <= max_area)
+    ok &= ~((cw / np.maximum(1, ch) > 22) & (ch < 6))
+    ok &= (comp > min_complex) & (comp < max_complex)
+    return ok
+
+
+def _area_scale(dpi: int) -> float:
+    """SIG_MIN_AREA/SIG_MAX_AREA están en px² a RENDER_DPI; el área crece con el cuadrado del DPI."""
+    return (dpi / RENDER_DPI) ** 2
+
+
+def _signature_bbox(
+    gray_full: np.ndarray, bands: List[Tuple[float, float]], dpi: int = RENDER_DPI
+) -> Optional[Tuple[int, int, int, int]]:
+    """
+    (x0, y0, x1, y1) de los trazos de la primera banda/umbral que supera SIG_MIN_STROKES, con
+    los umbrales de área escalados al DPI de la página. Corta en cuanto un umbral alcanza (no
+    calcula los siguientes) y no mide contornos fuera del rango de área.
+    """
+    scale = _area_scale(dpi)
+    min_area, max_area = SIG_MIN_AREA * scale, SIG_MAX_AREA * scale
+    for band in bands:
+        for cnts, x_off, y_off in _iter_roi_contours(gray_full, band):
+            feats = _contour_features(cnts, x_off, y_off, min_area, max_area)
+            mask = _stroke_mask(feats, min_area, max_area)
+            if int(mask.sum()) >= SIG_MIN_STROKES:
+                strokes = feats[mask]
+                return (
+                    int(strokes[:, 1].min()),
+                    int(strokes[:, 2].min()),
+                    int((strokes[:, 1] + strokes[:, 3]).max()),
+                    int((strokes[:, 2] + strokes[:, 4]).max()),
+                )
+    return None
+
+
+def _find_signature_region(
+    file_path: str,
+    dpi: int = RENDER_DPI,
+    bands: Optional[List[Tuple[float, float]]] = None,
+    deadline: Optional[_Deadline] = None,
+    report: Optional[_RenderReport] = None,
+) -> Optional[np.ndarray]:
+    """
+    Devuelve el recorte (escala de grises) que abarca los trazos de la primera banda que
+    supera SIG_MIN_STROKES, o None si no hay firma visual. Las fallas de render/análisis
+    se propagan: el llamador debe distinguirlas de "no hallada".
+    """
+    bands = bands or SIG_ROI_BANDS
+    if _page_pool() is not None:
+        for arena, desc, bbox in _map_pages(
+            file_path, dpi, _signature_bbox, bands, deadline=deadline, report=report
+        ):
+            if bbox is not None:
+                x0, y0, x1, y1 = bbox
+                return arena.view(desc)[y0:y1, x0:x1].copy()
+        return None
+
+    for im in _iter_pages(file_path, dpi=dpi, report=report, deadline=deadline):
+        if deadline is not None and deadline.expired():
+            return None
+        gray_full = np.asarray(im)
+        bbox = _signature_bbox(gray_full, bands, _page_dpi(im, dpi))
+        if bbox is not None:
+            x0, y0, x1, y1 = bbox
+            return gray_full[y0:y1, x0:x1].copy()
+
+    return None
+
+
+def _has_signature_visual(
+    file_path: str,
+    dpi: int = RENDER_DPI,
+    bands: Optional[List[Tuple[float, float]]] = None,
+    deadline: Optional[_Deadline] = None,
+) -> bool:
+    return _find_signature_region(file_path, dpi=dpi, bands=bands, deadline=deadline) is not None
+
+
+def _find_firma(
+    text: str,
+    file_path: str,
+    mode: str = "standard",
+    deadline: Optional[_Deadline] = None,
+    checks: Optional[Dict[str, str]] = None,
+    report: Optional[_RenderReport] = None,
+) -> Tuple[bool, Optional[str], Optional[np.ndarray]]:
+    """
+    Firma por texto y, si no aparece, por objetos del PDF (fast) o análisis visual
+    (standard/thorough). Deja en `checks` qué etapas corrieron; si el presupuesto se
+    agotó antes del análisis visual, se degrada al chequeo de objetos; si el análisis visual
+    falla, queda CHECK_ERROR, y si no se analizaron todas las páginas o se bajó el DPI,
+    CHECK_LIMITED (la firma no se da por ausente).
+    Retorna (hallada, método, recorte de la firma si se halló visualmente).
+    """
+    checks = checks if checks is not None else {}
+    checks["firma_texto"] = CHECK_OK
     low = text.lower()
     n = len(low)
     tail = low[int(n * 0.65):]
 
     strong = [r"firma\s+del", r"firma\s*y\s*sello", r"firmado\s+por", r"firma:\s"]
     if any(re.search(p, tail) for p in strong):
-        return True, "texto"
+        checks["firma_objetos"] = checks["firma_visual"] = CHECK_NO_REQ
+        return True, "texto", None
 
     name_like = re.search(r"\b[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+(?:\s+[A-ZÁÉÍÓÚÑ][a-záéíóúñ]+){1,3}\b", tail)
     has_ced = _find_cedula(tail)
     has_fec = _find_fecha(tail)
     if name_like and has_ced and has_fec:
-        return True, "texto"
-
-    if _has_signature_visual(file_path):
-        return True, "visual"
-
-    return False, None
+        checks["firma_objetos"] = checks["firma_visual"] = CHECK_NO_REQ
+        return True, "texto", None
+
+    if mode == "fast" or (deadline is not None and deadline.expired()):
+        checks["firma_visual"] = CHECK_OMIT_MODE if mode == "fast" else CHECK_OMIT_TIME
+        checks["firma_objetos"] = CHECK_OK
+        if _has_signature_objects(file_path):
+            return True, "objeto", None
+        return False, None, None
+
+    checks["firma_objetos"] = CHECK_NO_REQ
+    thorough = mode == "thorough"
+    try:
+        crop = _find_signature_region(
+            file_path,
+            dpi=MODE_DPI[mode],
+            bands=SIG_ROI_BANDS_THOROUGH if thorough else SIG_ROI_BANDS,
+            deadline=deadline,
+            report=report,
+        )
+    except _RENDER_ERRORS:
+        checks["firma_visual"] = CHECK_ERROR
+        return False, None, None
+    if crop is not None:
+        checks["firma_visual"] = CHECK_OK
+        return True, "visual", crop
+    if deadline is not None and deadline.hit:
+        checks["firma_visual"] = CHECK_PARTIAL
+    elif report is not None and report.limited:
+        checks["firma_visual"] = CHECK_LIMITED
+    else:
+        checks["firma_visual"] = CHECK_OK
+    return False, None, None
 
 
 # =========================
@@ -205,6 +749,14 @@ def _extract_documento(text: str) -> str:
     return m2.group(1) if m2 else ""
 
 
+def _extract_cedula(text: str) -> str:
+    m = re.search(
+        r"(?:\bcc\b|c\.c\.|c[eé]dula|identificaci[oó]n)\s*(?:no\.?|n[°º])?\s*[:\-]?\s*(\d{6,10})\b",
+        text, flags=re.IGNORECASE,
+    )
+    return m.group(1) if m else ""
+
+
 def _extract_medicamento(text: str) -> str:
     m = re.search(r"\b([A-ZÁÉÍÓÚÑ][A-ZÁÉÍÓÚÑ0-9\-\s]{2,}?\s\d+(?:\.\d+)?\s*(?:MG|ML))\b", text, flags=re.IGNORECASE)
     return (m.group(1).strip() if m else "").upper()
@@ -221,8 +773,36 @@ def _extract_cantidad(text: str) -> str:
 # =========================
 # Auditor principal
 # =========================
-def audit_pdf(file_path: str):
-    result = {
+def _no_verificados(result: Dict[str, Any], checks: Dict[str, str]) -> List[str]:
+    """
+    Campos cuyo resultado no es concluyente: un 'no detectado' porque una etapa se omitió,
+    se cortó o falló, o una firma hallada solo por objetos del PDF (indicio débil: bordes
+    redondeados, logos o sellos también son curvas/imágenes en la parte baja de la página).
+    """
+    out: List[str] = []
+    if not result.get("firma") and checks.get("firma_visual") in _INCOMPLETE:
+        out.append("firma")
+    elif result.get("firma") and result.get("firma_method") == "objeto":
+        out.append("firma")
+    if checks.get("ocr") in _INCOMPLETE:
+        out.extend(k for k in ("cedula", "medicamento", "fecha", "cantidad") if not result.get(k))
+    return out
+
+
+def audit_pdf(file_path: str, mode: str = "standard", budget_ms: Optional[int] = None):
+    """
+    Audita un PDF. `mode` ∈ AUDIT_MODES; `budget_ms` es el presupuesto de tiempo: al
+    agotarse se omiten/cortan OCR y firma visual. `checks` y `no_verificados` en el
+    resultado indican qué corrió y qué faltantes no son concluyentes.
+    """
+    if mode not in AUDIT_MODES:
+        raise ValueError(f"Modo de auditoría inválido: {mode} (use {', '.join(AUDIT_MODES)})")
+
+    t0 = time.monotonic()
+    deadline = _Deadline(budget_ms)
+    ocr_report, firma_report = _RenderReport(), _RenderReport()
+    checks: Dict[str, str] = {"texto_pdf": CHECK_OK}
+    result: Dict[str, Any] = {
         "firma": False,
         "cedula": False,
         "medicamento": False,
@@ -233,12 +813,37 @@ def audit_pdf(file_path: str):
 
     try:
         text_plain = _extract_text_pdfplumber(file_path)
-        text = text_plain if len(text_plain.strip()) >= 25 else _extract_text_ocr(file_path)
+        if len(text_plain.strip()) >= 25:
+            text = text_plain
+            checks["ocr"] = CHECK_NO_REQ
+        elif mode == "fast":
+            text = text_plain
+            checks["ocr"] = CHECK_OMIT_MODE
+        elif deadline.expired():
+            text = text_plain
+            checks["ocr"] = CHECK_OMIT_TIME
+        else:
+            text = _extract_text_ocr(file_path, dpi=MODE_DPI[mode], deadline=deadline, report=ocr_report)
+            if deadline.hit:
+                # timeout antes de leer alguna página => omitido; a mitad => parcial
+                checks["ocr"] = CHECK_PARTIAL if text.strip() else CHECK_OMIT_TIME
+            else:
+                checks["ocr"] = CHECK_LIMITED if ocr_report.limited else CHECK_OK
 
         if not _has_receipt_context(text):
             result["faltantes"] = ["firma", "cedula", "medicamento", "fecha", "cantidad"]
-            result["reason"] = "Documento sin contexto válido de dispensación/tirilla"
+            if checks["ocr"] in _INCOMPLETE:
+                result["reason"] = f"Sin capa de texto suficiente y OCR {checks['ocr']}"
+                result["no_verificados"] = list(result["faltantes"])
+            else:
+                result["reason"] = "Documento sin contexto válido de dispensación/tirilla"
+                result["no_verificados"] = []
             result["extraido"] = {"documento": "", "fecha_pedido": "", "medicamento": "", "cantidad": ""}
+            result["modo"] = mode
+            result["checks"] = checks
+            if ocr_report.limited:
+                result["limites_render"] = ocr_report.as_dict()
+            result["tiempo_ms"] = int((time.monotonic() - t0) * 1000)
             result["debug_text_sample"] = text[:400]
             return result
 
@@ -246,7 +851,9 @@ def audit_pdf(file_path: str):
         result["fecha"] = _find_fecha(text)
         result["cantidad"] = _find_cantidad(text)
         result["medicamento"] = _find_medicamento(text)
-        firma_val, firma_method = _find_firma(text, file_path)
+        firma_val, firma_method, firma_crop = _find_firma(
+            text, file_path, mode=mode, deadline=deadline, checks=checks, report=firma_report
+        )
         result["firma"] = firma_val
         result["firma_method"] = firma_method
 
@@ -261,27 +868,61 @@ def audit_pdf(file_path: str):
             "fecha_pedido": _extract_fecha(text),
             "medicamento": _extract_medicamento(text),
             "cantidad": _extract_cantidad(text),
+            "cedula": _extract_cedula(text),
         }
 
+        # Hash perceptual de la firma (índice de firmas reutilizadas). En thorough se busca la
+        # región aunque la firma se haya hallado por texto; si fue por visual (o el escaneo ya
+        # falló/no halló nada), otra pasada solo repetiría el mismo render a 300 DPI.
+        if (firma_crop is None and mode == "thorough" and firma_method == "texto"
+                and not deadline.expired()):
+            try:
+                firma_crop = _find_signature_region(
+                    file_path, dpi=MODE_DPI[mode], bands=SIG_ROI_BANDS_THOROUGH, deadline=deadline
+                )
+            except _RENDER_ERRORS:
+                firma_crop = None  # sin hash; la firma ya se resolvió por texto
+        if firma_crop is not None and firma_crop.size:
+            result["firma_hash"] = signature_hash(firma_crop)
+
+        no_verificados = _no_verificados(result, checks)
+        limited = [r for r in (ocr_report, firma_report) if r.limited]
+        if limited:
+            result["limites_render"] = limited[0].as_dict()
+        result["modo"] = mode
+        result["checks"] = checks
+        result["no_verificados"] = no_verificados
+
         # Observaciones amigables
         obs = []
         if "reason" in result:
             obs.append(result["reason"])
+        if limited:
+            lim = limited[0]
+            if lim.paginas_omitidas:
+                obs.append(f"{lim.paginas_omitidas} página(s) sin analizar (PDF_MAX_PAGES)")
+            if lim.dpi_reducido:
+                obs.append(f"Render a {lim.dpi_min} DPI (pedido {lim.dpi_pedido}) por PDF_RENDER_MAX_MB")
         if result["firma"] and result.get("firma_method") == "visual":
             obs.append("Firma detectada por análisis visual")
+        elif result["firma"] and result.get("firma_method") == "objeto":
+            obs.append("Firma probable por objetos del PDF (no verificada)")
         elif result["firma"] and result.get("firma_method") == "texto":
             obs.append("Firma detectada por texto OCR")
-        if not result["firma"]:
-            obs.append("Firma no detectada")
+        if not result["firma"] and checks.get("firma_visual") == CHECK_ERROR:
+            obs.append("Firma no verificada (falló el análisis visual)")
+        elif not result["firma"]:
+            obs.append("Firma no verificada" if "firma" in no_verificados else "Firma no detectada")
         if not result["cedula"]:
-            obs.append("Cédula no detectada")
+            obs.append("Cédula no verificada" if "cedula" in no_verificados else "Cédula no detectada")
         if not result["medicamento"]:
-            obs.append("Medicamento no detectado")
+            obs.append("Medicamento no verificado" if "medicamento" in no_verificados else "Medicamento no detectado")
         if not result["fecha"]:
-            obs.append("Fecha no detectada")
+            obs.append("Fecha no verificada" if "fecha" in no_verificados else "Fecha no detectada")
         if not result["cantidad"]:
-            obs.append("Cantidad no detectada")
+            obs.append("Cantidad no verificada" if "cantidad" in no_verificados else "Cantidad no detectada")
         result["observaciones"] = "; ".join(dict.fromkeys(obs))
+        result["tiempo_ms"] = int((time.monotonic() - t0) * 1000)
 
         result["debug_text_sample"] = text[:400]
         return result
@@ -1,6 +1,6 @@
 import os
 import shutil
-from typing import Any, Dict
+from typing import Any, Dict, Optional
 
 from fastapi import UploadFile
 
@@ -8,6 +8,7 @@ from app.core.config import settings
 from app.services.pdf_auditor import audit_pdf
 from app.services.reference_loader import load_reference
 from app.services.audit_logger import log_result
+from app.services.signature_index import get_index
 
 
 def _as_dict(obj: Any) -> Dict[str, Any]:
@@ -20,10 +21,14 @@ def _norm(s: Any) -> str:
     return " ".join(str(s or "").strip().upper().split())
 
 
-def process_pdf(upload_file: UploadFile) -> Dict[str, Any]:
+def process_pdf(
+    upload_file: UploadFile,
+    mode: str = "standard",
+    budget_ms: Optional[int] = None,
+) -> Dict[str, Any]:
     """
     Guarda el UploadFile, audita y registra en Excel (reemplaza fila si existe).
-    Retorna payload listo para API.
+    Retorna payload listo para API. `mode`/`budget_ms` se pasan a audit_pdf.
     """
     # 1) Directorio de uploads
     upload_dir = settings.UPLOAD_DIR or os.path.join(settings.BASE_DIR, "uploads")
@@ -37,15 +42,38 @@ def process_pdf(upload_file: UploadFile) -> Dict[str, Any]:
     with open(file_path, "wb") as buffer:
         shutil.copyfileobj(upload_file.file, buffer)
 
+    return process_path(file_path, filename=filename, mode=mode, budget_ms=budget_ms)
+
+
+def process_path(
+    file_path: str,
+    filename: Optional[str] = None,
+    reference: Optional[Dict[str, Dict[str, str]]] = None,
+    log: bool = True,
+    mode: str = "standard",
+    budget_ms: Optional[int] = None,
+    index_key: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Audita un PDF que ya está en disco, lo cruza con la tabla de referencia y
+    (opcionalmente) lo registra en Excel. Usado por la API y por el batch offline.
+    `reference` permite reutilizar la tabla ya cargada (evita releer el CSV por archivo).
+    `index_key` identifica el documento en el índice de firmas (el batch pasa su clave);
+    por defecto, la ruta resuelta.
+    """
+    filename = filename or os.path.basename(file_path)
+    index_key = index_key or os.path.realpath(file_path)
+
     # 4) Auditoría
-    audit_result_any: Any = audit_pdf(file_path)
+    audit_result_any: Any = audit_pdf(file_path, mode=mode, budget_ms=budget_ms)
     audit_result: Dict[str, Any] = _as_dict(audit_result_any)
 
     # 5) Cruce contra tabla de referencia (datasets/tabla_referencia.csv)
-    try:
-        reference = load_reference()  # Dict[str, Dict[str, str]] indexado por PEDIDO (= nombre PDF)
-    except Exception:
-        reference = {}
+    if reference is None:
+        try:
+            reference = load_reference()  # Dict[str, Dict[str, str]] indexado por PEDIDO (= nombre PDF)
+        except Exception:
+            reference = {}
 
     expected = reference.get(filename) if isinstance(reference, dict) else None
 
@@ -67,6 +95,28 @@ def process_pdf(upload_file: UploadFile) -> Dict[str, Any]:
     else:
         audit_result["comparacion"] = {"info": "Sin fila de referencia para este archivo."}
 
+    # 5b) Firmas casi idénticas en documentos de otros pacientes (índice de firmas)
+    firma_hash = audit_result.get("firma_hash")
+    if firma_hash and settings.SIG_INDEX_ENABLED:
+        extra_idx: Dict[str, Any] = _as_dict(audit_result.get("extraido"))
+        # Solo la cédula identifica al paciente (documento es el pedido/MIPRES); sin ella,
+        # paciente desconocido
+        paciente = str(extra_idx.get("cedula") or "")
+        try:
+            index = get_index()
+            similares = index.query(firma_hash, clave=index_key, paciente=paciente)
+            index.add(firma_hash, clave=index_key, archivo=filename, paciente=paciente)
+        except Exception:
+            similares = []
+        audit_result["firmas_similares"] = similares
+        if similares:
+            if paciente:
+                nota = f"Firma casi idéntica a {len(similares)} documento(s) de otro(s) paciente(s)"
+            else:
+                nota = f"Firma casi idéntica a {len(similares)} documento(s) (cédula no extraída)"
+            obs_prev = audit_result.get("observaciones") or ""
+            audit_result["observaciones"] = f"{obs_prev}; {nota}" if obs_prev else nota
+
     # 6) Construir payload consistente para API/Excel
     payload: Dict[str, Any] = {
         "filename": filename,
@@ -76,10 +126,11 @@ def process_pdf(upload_file: UploadFile) -> Dict[str, Any]:
     }
 
     # 7) Registrar en Excel (no romper si falla escritura)
-    try:
-        log_result(payload)
-    except Exception:
-        pass
+    if log:
+        try:
+            log_result(payload)
+        except Exception:
+            pass
 
     return payload
 
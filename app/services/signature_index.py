@@ -0,0 +1,231 @@
+"""
+Índice de firmas por hash perceptual (pHash de 64 bits) para detectar la misma firma
+escaneada pegada en varias tirillas de pacientes distintos.
+
+- signature_hash(recorte) -> hex de 16 caracteres (estable ante reescalado, ruido y
+  pequeños cambios de contraste; distancia de Hamming baja = firmas casi idénticas).
+- SignatureIndex: multi-index hashing en memoria (búsqueda por radio de Hamming que solo
+  verifica los hashes que coinciden en algún trozo)
+  respaldado por un JSONL de solo-anexar, para que sobreviva reinicios y se comparta
+  entre procesos (cada consulta lee primero lo que otros procesos hayan anexado).
+"""
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import datetime
+from functools import lru_cache
+from itertools import combinations
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+import cv2
+
+from app.core.config import settings
+
+
+# =========================
+# Hash perceptual
+# =========================
+def signature_hash(gray: np.ndarray) -> str:
+    """pHash: DCT de la imagen a 32x32, bits = coeficientes 8x8 de baja frecuencia > mediana."""
+    small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
+    low = cv2.dct(small)[:8, :8].flatten()
+    bits = low > np.median(low[1:])  # sin la componente DC, que solo refleja el brillo medio
+    value = 0
+    for b in bits:
+        value = (value << 1) | int(b)
+    return f"{value:016x}"
+
+
+def hamming(a: int, b: int) -> int:
+    return bin(a ^ b).count("1")
+
+
+# =========================
+# Multi-index hashing
+# =========================
+@lru_cache(maxsize=None)
+def _flip_masks(bits: int, radius: int) -> Tuple[int, ...]:
+    """Máscaras de `bits` bits con a lo sumo `radius` bits en 1 (vecinos a esa distancia)."""
+    return tuple(
+        sum(1 << i for i in combo)
+        for r in range(radius + 1)
+        for combo in combinations(range(bits), r)
+    )
+
+
+class MultiIndexHash:
+    """
+    Multi-index hashing sobre enteros de 64 bits con distancia de Hamming. Se parte el hash
+    en `chunks` trozos y cada trozo indexa un dict {valor del trozo: [ids]}. Si dos hashes
+    están a distancia <= r, algún trozo difiere en <= r // chunks bits (palomar): basta
+    consultar esos vecinos exactos en cada dict y verificar Hamming solo en los candidatos.
+    `last_candidates` cuenta los candidatos verificados en la última búsqueda.
+    """
+
+    def __init__(self, chunks: int = 5, bits: int = 64):
+        chunks = max(1, min(bits, chunks))
+        self._widths = [bits // chunks + (1 if i < bits % chunks else 0) for i in range(chunks)]
+        self._shifts = [sum(self._widths[i + 1:]) for i in range(chunks)]
+        self._tables: List[Dict[int, List[int]]] = [{} for _ in range(chunks)]
+        self._values: List[int] = []
+        self._payloads: List[Any] = []
+        self.last_candidates = 0
+
+    @property
+    def size(self) -> int:
+        return len(self._values)
+
+    def _chunks(self, value: int):
+        for width, shift in zip(self._widths, self._shifts):
+            yield (value >> shift) & ((1 << width) - 1)
+
+    def add(self, value: int, payload: Any) -> None:
+        ident = len(self._values)
+        self._values.append(value)
+        self._payloads.append(payload)
+        for table, chunk in zip(self._tables, self._chunks(value)):
+            table.setdefault(chunk, []).append(ident)
+
+    def search(self, value: int, radius: int) -> List[Tuple[int, Any]]:
+        """[(distancia, payload)] con distancia <= radius (sin ordenar)."""
+        sub = radius // len(self._tables)
+        masks = [_flip_masks(w, sub) for w in self._widths]
+        if sum(len(m) for m in masks) >= self.size:
+            candidates = range(self.size)  # radio grande / índice chico: consultar cuesta más que recorrer
+        else:
+            found = set()
+            for table, chunk, chunk_masks in zip(self._tables, self._chunks(value), masks):
+                for mask in chunk_masks:
+                    ids = table.get(chunk ^ mask)
+                    if ids:
+                        found.update(ids)
+            candidates = found
+        self.last_candidates = len(candidates)
+        out: List[Tuple[int, Any]] = []
+        for ident in candidates:
+            d = hamming(value, self._values[ident])
+            if d <= radius:
+                out.append((d, self._payloads[ident]))
+        return out
+
+
+# =========================
+# Índice persistente
+# =========================
+@dataclass
+class _Entry:
+    seq: int
+    hash: str
+    clave: str     # identidad del documento (clave del batch o ruta resuelta)
+    archivo: str   # nombre para mostrar
+    paciente: str
+
+
+class SignatureIndex:
+    """
+    Índice de firmas persistente, por clave de documento (no por nombre: dos PDF homónimos
+    en carpetas distintas son documentos distintos). Un documento re-auditado reemplaza su
+    entrada anterior (la vieja queda en el índice pero se ignora al consultar).
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        # Con trozos de ~13 bits cada uno se consulta a distancia <= 1 (70 lookups con r=8)
+        self._hashes = MultiIndexHash(chunks=settings.SIG_MATCH_MAX_DIST // 2 + 1)
+        self._latest: Dict[str, int] = {}
+        self._seq = 0
+        self._offset = 0
+        self._lock = threading.Lock()
+
+    def _ingest(self, rec: Dict[str, Any]) -> None:
+        try:
+            value = int(rec["hash"], 16)
+        except (KeyError, TypeError, ValueError):
+            return
+        self._seq += 1
+        archivo = str(rec.get("archivo", ""))
+        clave = str(rec.get("clave") or archivo)  # registros previos a la clave: el nombre
+        entry = _Entry(self._seq, rec["hash"], clave, archivo, str(rec.get("paciente", "")))
+        self._latest[entry.clave] = entry.seq
+        self._hashes.add(value, entry)
+
+    def _refresh(self) -> None:
+        """Incorpora las líneas anexadas (por este u otro proceso) desde la última lectura."""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as fh:
+            fh.seek(self._offset)
+            data = fh.read()
+        end = data.rfind(b"\n") + 1  # una línea a medio escribir se lee en la próxima pasada
+        for line in data[:end].splitlines():
+            try:
+                self._ingest(json.loads(line))
+            except ValueError:
+                continue
+        self._offset += end
+
+    def query(self, hash_hex: str, clave: str = "", paciente: str = "",
+              max_dist: Optional[int] = None, top_k: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Firmas casi idénticas en OTROS documentos (clave distinta de `clave`) de OTROS
+        pacientes (o paciente desconocido), ordenadas por distancia de Hamming.
+        """
+        max_dist = settings.SIG_MATCH_MAX_DIST if max_dist is None else max_dist
+        top_k = settings.SIG_MATCH_TOP_K if top_k is None else top_k
+        value = int(hash_hex, 16)
+        with self._lock:
+            self._refresh()
+            hits = self._hashes.search(value, max_dist)
+            matches = [
+                (d, e) for d, e in hits
+                if self._latest.get(e.clave) == e.seq
+                and e.clave != clave
+                and not (paciente and e.paciente == paciente)
+            ]
+        matches.sort(key=lambda m: (m[0], m[1].clave))
+        return [
+            {"archivo": e.archivo, "clave": e.clave, "paciente": e.paciente, "distancia": d, "hash": e.hash}
+            for d, e in matches[:top_k]
+        ]
+
+    def add(self, hash_hex: str, clave: str, archivo: Optional[str] = None, paciente: str = "") -> None:
+        """`archivo` (para mostrar) es por defecto el nombre base de `clave`."""
+        rec = {
+            "hash": hash_hex,
+            "clave": clave,
+            "archivo": archivo if archivo is not None else os.path.basename(clave),
+            "paciente": paciente,
+            "timestamp": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        line = (json.dumps(rec, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            self._refresh()
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            # O_APPEND: líneas cortas de varios procesos no se intercalan
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                os.write(fd, line)
+            finally:
+                os.close(fd)
+            self._refresh()
+
+    def __len__(self) -> int:
+        with self._lock:
+            self._refresh()
+            return len(self._latest)
+
+
+_INDEX: Optional[SignatureIndex] = None
+_INDEX_LOCK = threading.Lock()
+
+
+def get_index() -> SignatureIndex:
+    """Índice compartido del proceso (archivo en settings.SIG_INDEX_FILE)."""
+    global _INDEX
+    with _INDEX_LOCK:
+        if _INDEX is None or str(_INDEX.path) != settings.SIG_INDEX_FILE:
+            _INDEX = SignatureIndex(settings.SIG_INDEX_FILE)
+        return _INDEX
@@ -0,0 +1,174 @@
+import time
+
+import pytest
+
+pytest.importorskip("pdfplumber")
+pytest.importorskip("cv2")
+
+from PIL import Image  # noqa: E402
+
+from app.services import pdf_auditor as pa  # noqa: E402
+from app.tools.load_test import make_scanned_pdf, make_text_pdf  # noqa: E402
+
+SIN_FIRMA = [
+    "DISPENSACION DE MEDICAMENTOS",
+    "Pedido No. 3153711068",
+    "Fecha: 12/03/2024",
+    "Paciente: CC 12345678",
+    "MEDICAMENTOS AUTORIZADOS   PRESENTACION   CANTIDAD",
+    "ACETAMINOFEN 500 MG   TABLETA   30",
+]
+
+
+def _write(tmp_path, name, data):
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+
+def _slow_blank_pages(n_pages, delay_s):
+    def fake_iter_pages(file_path, dpi=pa.RENDER_DPI, **kw):
+        for _ in range(n_pages):
+            time.sleep(delay_s)
+            yield Image.new("L", (400, 500), 255)
+    return fake_iter_pages
+
+
+def test_fast_mode_skips_visual_and_marks_firma_unverified(tmp_path, monkeypatch):
+    monkeypatch.setattr(pa, "_iter_pages", lambda *a, **k: pytest.fail("fast no debe renderizar"))
+    r = pa.audit_pdf(_write(tmp_path, "a.pdf", make_text_pdf(lines=SIN_FIRMA)), mode="fast")
+
+    assert r["modo"] == "fast"
+    assert r["checks"]["ocr"] == pa.CHECK_NO_REQ
+    assert r["checks"]["firma_visual"] == pa.CHECK_OMIT_MODE
+    assert r["checks"]["firma_objetos"] == pa.CHECK_OK
+    assert r["firma"] is False and r["no_verificados"] == ["firma"]
+    assert "Firma no verificada" in r["observaciones"]
+
+
+def test_fast_mode_without_text_layer_is_not_conclusive(tmp_path):
+    r = pa.audit_pdf(_write(tmp_path, "b.pdf", make_scanned_pdf(width=60, height=80)), mode="fast")
+    assert r["checks"]["ocr"] == pa.CHECK_OMIT_MODE
+    assert set(r["no_verificados"]) == {"firma", "cedula", "medicamento", "fecha", "cantidad"}
+
+
+def test_budget_cuts_visual_scan(tmp_path, monkeypatch):
+    monkeypatch.setattr(pa, "_iter_pages", _slow_blank_pages(n_pages=50, delay_s=0.02))
+    path = _write(tmp_path, "c.pdf", make_text_pdf(lines=SIN_FIRMA))
+
+    t0 = time.monotonic()
+    r = pa.audit_pdf(path, mode="standard", budget_ms=100)
+    assert time.monotonic() - t0 < 0.6
+    assert r["checks"]["firma_visual"] == pa.CHECK_PARTIAL
+    assert r["no_verificados"] == ["firma"]
+
+
+def test_standard_without_budget_is_conclusive(tmp_path, monkeypatch):
+    monkeypatch.setattr(pa, "_iter_pages", _slow_blank_pages(n_pages=2, delay_s=0))
+    r = pa.audit_pdf(_write(tmp_path, "d.pdf", make_text_pdf(lines=SIN_FIRMA)))
+    assert r["modo"] == "standard"
+    assert r["checks"]["firma_visual"] == pa.CHECK_OK
+    assert r["firma"] is False and r["no_verificados"] == []
+    assert "Firma no detectada" in r["observaciones"]
+
+
+def test_invalid_mode_rejected():
+    with pytest.raises(ValueError):
+        pa.audit_pdf("x.pdf", mode="turbo")
+
+
+def test_render_failure_is_not_a_confident_no_firma(tmp_path, monkeypatch):
+    def broken_iter_pages(file_path, dpi=pa.RENDER_DPI, **kw):
+        raise pa.PDFInfoNotInstalledError("poppler no instalado")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(pa, "_iter_pages", broken_iter_pages)
+    r = pa.audit_pdf(_write(tmp_path, "e.pdf", make_text_pdf(lines=SIN_FIRMA)))
+    assert r["checks"]["firma_visual"] == pa.CHECK_ERROR
+    assert r["firma"] is False and r["no_verificados"] == ["firma"]
+    assert "falló el análisis visual" in r["observaciones"]
+
+
+def test_fast_mode_object_signature_is_not_conclusive(tmp_path, monkeypatch):
+    monkeypatch.setattr(pa, "_has_signature_objects", lambda *a, **k: True)
+    r = pa.audit_pdf(_write(tmp_path, "f.pdf", make_text_pdf(lines=SIN_FIRMA)), mode="fast")
+    assert r["firma"] is True and r["firma_method"] == "objeto"
+    assert r["no_verificados"] == ["firma"]
+
+
+def test_budget_is_passed_as_poppler_timeout(monkeypatch):
+    calls = []
+
+    def fake_info(path, timeout=None, **kw):
+        calls.append(("info", timeout))
+        return {"Pages": 3, "Page size": "612 x 792 pts (letter)"}
+
+    def fake_convert(path, timeout=None, **kw):
+        calls.append(("render", timeout))
+        raise pa.PDFPopplerTimeoutError("Run poppler timeout.")
+
+    monkeypatch.setattr(pa, "pdfinfo_from_path", fake_info)
+    monkeypatch.setattr(pa, "convert_from_path", fake_convert)
+    deadline = pa._Deadline(500)
+    assert list(pa._iter_pages("x.pdf", deadline=deadline)) == []
+    assert deadline.hit
+    assert [k for k, _ in calls] == ["info", "render"] and all(0 < t <= 0.5 for _, t in calls)
+
+
+def test_ocr_timeout_maps_to_omitted_by_time(tmp_path, monkeypatch):
+    timeouts = []
+
+    def slow_ocr(im, timeout=0, **kw):
+        timeouts.append(timeout)
+        raise RuntimeError("Tesseract process timeout")
+
+    monkeypatch.setattr(pa, "_iter_pages", _slow_blank_pages(n_pages=3, delay_s=0))
+    monkeypatch.setattr(pa.pytesseract, "image_to_string", slow_ocr)
+    r = pa.audit_pdf(_write(tmp_path, "g.pdf", make_scanned_pdf(width=60, height=80)), budget_ms=800)
+
+    assert timeouts and 0 < timeouts[0] <= 0.8 and len(timeouts) == 1
+    assert r["checks"]["ocr"] == pa.CHECK_OMIT_TIME
+    assert "cedula" in r["no_verificados"]
+
+
+def test_worker_ocr_returns_none_on_budget_timeout(monkeypatch):
+    import numpy as np
+
+    def timeout_ocr(im, **kw):
+        raise RuntimeError("Tesseract process timeout")
+
+    monkeypatch.setattr(pa.pytesseract, "image_to_string", timeout_ocr)
+    gray = np.full((20, 20), 255, np.uint8)
+    assert pa._ocr_array(gray, time.monotonic() + 0.5) is None
+    with pytest.raises(RuntimeError):
+        pa._ocr_array(gray, None)
+
+
+@pytest.mark.parametrize("lines, renders", [
+    (SIN_FIRMA, [300]),                                 # visual sin firma: no se repite el escaneo
+    (SIN_FIRMA + ["", "", "Firma: ____________"], [300]),  # firma por texto: una pasada para el hash
+])
+def test_thorough_renders_each_page_set_once(tmp_path, monkeypatch, lines, renders):
+    passes = []
+
+    def counting_iter_pages(file_path, dpi=pa.RENDER_DPI, **kw):
+        passes.append(dpi)
+        yield Image.new("L", (400, 500), 255)
+
+    monkeypatch.setattr(pa, "_iter_pages", counting_iter_pages)
+    pa.audit_pdf(_write(tmp_path, "g.pdf", make_text_pdf(lines=lines)), mode="thorough")
+    assert passes == renders
+
+
+def test_thorough_render_error_is_not_retried(tmp_path, monkeypatch):
+    passes = []
+
+    def broken_iter_pages(file_path, dpi=pa.RENDER_DPI, **kw):
+        passes.append(dpi)
+        raise pa.PDFInfoNotInstalledError("poppler no instalado")
+        yield  # pragma: no cover
+
+    monkeypatch.setattr(pa, "_iter_pages", broken_iter_pages)
+    r = pa.audit_pdf(_write(tmp_path, "h.pdf", make_text_pdf(lines=SIN_FIRMA)), mode="thorough")
+    assert r["checks"]["firma_visual"] == pa.CHECK_ERROR
+    assert passes == [300]
@@ -0,0 +1,142 @@
+import json
+
+import pytest
+
+pytest.importorskip("pandas")
+pytest.importorskip("pdfplumber")
+
+from app.services.batch_processor import (  # noqa: E402
+    in_shard,
+    list_inputs,
+    load_done_keys,
+    parse_shard,
+    _truncate_partial_line,
+)
+
+
+def test_parse_shard():
+    assert parse_shard("2/5") == (2, 5)
+    for bad in ("5/5", "-1/3", "a/b", "3"):
+        with pytest.raises(Exception):
+            parse_shard(bad)
+
+
+def test_shards_cover_every_key_once():
+    keys = [f"lote/{i}.pdf" for i in range(500)]
+    owners = [[s for s in range(4) if in_shard(k, s, 4)] for k in keys]
+    assert all(len(o) == 1 for o in owners)
+    assert {o[0] for o in owners} == {0, 1, 2, 3}
+
+
+def test_list_inputs_dir_and_manifest(tmp_path):
+    (tmp_path / "sub").mkdir()
+    (tmp_path / "b.pdf").write_bytes(b"%PDF")
+    (tmp_path / "sub" / "a.PDF").write_bytes(b"%PDF")
+    (tmp_path / "nota.txt").write_text("x")
+    assert [k for k, _ in list_inputs(directory=str(tmp_path))] == ["b.pdf", "sub/a.PDF"]
+
+    manifest = tmp_path / "lista.txt"
+    manifest.write_text("# comentario\nsub/a.PDF\n\nb.pdf\n")
+    items = list_inputs(manifest=str(manifest))
+    assert items == [("b.pdf", str(tmp_path / "b.pdf")), ("sub/a.PDF", str(tmp_path / "sub" / "a.PDF"))]
+
+
+def test_checkpoint_resume_ignores_truncated_line(tmp_path):
+    path = tmp_path / "shard-0-of-1.jsonl"
+    lines = [
+        json.dumps({"key": "a.pdf", "status": "success"}),
+        json.dumps({"key": "b.pdf", "status": "error"}),
+    ]
+    path.write_text("\n".join(lines) + "\n" + '{"key": "c.pdf", "sta')
+
+    _truncate_partial_line(path)
+    assert path.read_text().endswith("\n")
+    assert load_done_keys(path) == {"a.pdf", "b.pdf"}
+    assert load_done_keys(path, include_errors=False) == {"a.pdf"}
+
+
+def test_truncate_scans_back_across_blocks(tmp_path):
+    path = tmp_path / "shard-0-of-1.jsonl"
+    path.write_bytes(b'{"key": "a.pdf"}\n' + b"x" * 5000)
+    _truncate_partial_line(path, block=256)
+    assert path.read_bytes() == b'{"key": "a.pdf"}\n'
+
+    path.write_bytes(b"y" * 1000)
+    _truncate_partial_line(path, block=256)
+    assert path.read_bytes() == b""
+
+
+def test_merge_keeps_last_row_per_pdf_and_checks_excel_limit(tmp_path, monkeypatch):
+    import csv
+
+    from app.services import batch_processor
+
+    def line(key, status):
+        return json.dumps({"key": key, "filename": key, "status": status, "result": {"firma": status == "success"}})
+
+    s0 = tmp_path / "shard-0-of-2.jsonl"
+    s1 = tmp_path / "shard-1-of-2.jsonl"
+    s0.write_text(line("a.pdf", "error") + "\n" + line("b.pdf", "success") + "\n" + line("a.pdf", "success") + "\n")
+    s1.write_text(line("c.pdf", "success") + "\n")
+
+    out = tmp_path / "consolidado.csv"
+    merged = batch_processor.merge_results([str(s0), str(s1)], out)
+    assert merged["filas"] == 3 and merged["excel"] is None
+    with open(out, encoding="utf-8-sig", newline="") as fh:
+        rows = {r["archivo"]: r for r in csv.DictReader(fh)}
+    assert set(rows) == {"a.pdf", "b.pdf", "c.pdf"}
+    assert rows["a.pdf"]["firma"] == "✅"
+
+    monkeypatch.setattr(batch_processor, "EXCEL_MAX_ROWS", 2)
+    with pytest.raises(ValueError, match="Excel"):
+        batch_processor.merge_results([str(s0), str(s1)], out, excel=True)
+
+
+def _fake_audit(key, file_path, mode="standard", budget_ms=None):
+    import os
+
+    if key == "bad.pdf":
+        os._exit(1)  # simula un segfault de poppler/tesseract
+    return {"filename": key, "path": file_path, "key": key, "status": "success", "result": {}}
+
+
+def test_run_shard_survives_dead_worker_and_resumes(tmp_path, monkeypatch):
+    from app.services import batch_processor
+
+    monkeypatch.setattr(batch_processor, "_audit_one", _fake_audit)
+    items = [(f"{i:02d}.pdf", f"/x/{i:02d}.pdf") for i in range(8)] + [("bad.pdf", "/x/bad.pdf")]
+    out = tmp_path / "batch"
+    quiet = lambda msg: None  # noqa: E731
+
+    summary = batch_processor.run_shard(items, out_dir=out, workers=2, log=quiet)
+    assert (summary["procesados"], summary["errores"], summary["workers_caidos"]) == (9, 1, 1)
+    results = out / "shard-0-of-1.jsonl"
+    assert load_done_keys(results, include_errors=False) == {k for k, _ in items if k != "bad.pdf"}
+    assert load_done_keys(results) == {k for k, _ in items}
+
+    # Reanudar no repite el PDF que tumba al worker
+    again = batch_processor.run_shard(items, out_dir=out, workers=2, log=quiet)
+    assert (again["ya_hechos"], again["procesados"]) == (9, 0)
+
+    # --retry-errors solo reintenta el fallido
+    retry = batch_processor.run_shard(items, out_dir=out, workers=2, retry_errors=True, log=quiet)
+    assert (retry["ya_hechos"], retry["procesados"], retry["errores"]) == (8, 1, 1)
+
+
+def test_budget_ms_must_be_positive(capsys):
+    from app.services.batch_processor import main
+
+    for bad in ("0", "-5", "rápido"):
+        with pytest.raises(SystemExit) as exc:
+            main(["--dir", ".", "--budget-ms", bad])
+        assert exc.value.code == 2
+    assert "budget-ms" in capsys.readouterr().err
+
+
+def test_batch_key_identifies_document_in_signature_index(monkeypatch):
+    from app.services import batch_processor
+
+    seen = {}
+    monkeypatch.setattr(batch_processor, "process_path", lambda path, **kw: seen.update(kw) or {"result": {}})
+    batch_processor._audit_one("sede_sur/1001.pdf", "/datos/sede_sur/1001.pdf")
+    assert seen["index_key"] == "sede_sur/1001.pdf"
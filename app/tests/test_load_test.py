@@ -0,0 +1,63 @@
+import asyncio
+import io
+
+import pytest
+
+pdfplumber = pytest.importorskip("pdfplumber")
+pytest.importorskip("fastapi")
+
+from app.tools.load_test import (  # noqa: E402
+    TrafficMix,
+    _isolated_app,
+    asgi_client,
+    format_report,
+    make_scanned_pdf,
+    make_text_pdf,
+    percentile,
+    run_load,
+)
+
+
+def test_synthetic_pdfs_are_parseable():
+    with pdfplumber.open(io.BytesIO(make_text_pdf(seed=3))) as pdf:
+        assert "MEDICAMENTOS AUTORIZADOS" in (pdf.pages[0].extract_text() or "")
+    with pdfplumber.open(io.BytesIO(make_scanned_pdf(seed=3, width=100, height=120))) as pdf:
+        assert not (pdf.pages[0].extract_text() or "").strip()
+        assert len(pdf.pages[0].images) == 1
+
+
+def test_percentile_nearest_rank():
+    values = [float(v) for v in range(1, 101)]
+    assert percentile(values, 50) == 50.0
+    assert percentile(values, 99) == 99.0
+    assert percentile([], 95) == 0.0
+
+
+def test_in_process_run_reports_every_endpoint(tmp_path, monkeypatch):
+    from app.api.v1 import routes
+    from app.core.config import settings
+    from app.services import audit_logger, signature_index
+
+    # _isolated_app redirige rutas globales; se restauran al terminar el test
+    monkeypatch.setattr(settings, "UPLOAD_DIR", settings.UPLOAD_DIR)
+    monkeypatch.setattr(audit_logger, "XLSX_PATH", audit_logger.XLSX_PATH)
+    monkeypatch.setattr(routes, "XLSX_PATH", routes.XLSX_PATH)
+    monkeypatch.setattr(settings, "SIG_INDEX_FILE", settings.SIG_INDEX_FILE)
+    monkeypatch.setattr(signature_index, "_INDEX", signature_index._INDEX)
+
+    client = asgi_client(_isolated_app(tmp_path))
+    assert settings.SIG_INDEX_FILE == str(tmp_path / "firmas_index.jsonl")
+    traffic = TrafficMix({"texto": 1, "duplicado": 1, "reporte": 1}, oversized_mb=0)
+    report = asyncio.run(run_load(client, traffic, concurrency=2, total_requests=12))
+
+    assert report["total"]["requests"] == 12
+    assert set(report["por_endpoint"]) == {"/audit/pdf", "/upload-pdf", "/report/download"}
+    assert report["por_endpoint"]["/audit/pdf"]["status"] == {"200": report["por_endpoint"]["/audit/pdf"]["requests"]}
+    assert report["event_loop_lag"]["max_ms"] >= 0
+    assert "sonda_servidor" not in report
+
+    # Modo servidor: el lag local es del generador; la responsividad sale de la sonda a GET /
+    probed = asyncio.run(run_load(client, traffic, concurrency=2, total_requests=6, probe_path="/"))
+    assert "event_loop_lag" not in probed and probed["lag_cliente"]["max_ms"] >= 0
+    assert probed["sonda_servidor"]["sondas"] >= 1 and probed["sonda_servidor"]["errores"] == 0
+    assert "Sonda servidor" in format_report(probed)
@@ -0,0 +1,125 @@
+import os
+import random
+import tracemalloc
+from multiprocessing import shared_memory
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from app.services.page_buffers import PageArena, live_blocks, run_on_page  # noqa: E402
+
+
+def _checksum(view, k):
+    return int(view.sum()) * k
+
+
+def _die(view, *args):
+    os._exit(1)
+
+
+def test_round_trip_and_release():
+    page = np.arange(300 * 200, dtype=np.uint8).reshape(300, 200)
+    with PageArena() as arena:
+        desc = arena.put(page)
+        assert desc.shape == (300, 200)
+        assert run_on_page(desc, _checksum, 2) == int(page.sum()) * 2
+        assert live_blocks() == 1
+    assert live_blocks() == 0
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=desc.name)
+
+
+def test_blocks_freed_on_error():
+    with pytest.raises(RuntimeError):
+        with PageArena() as arena:
+            arena.put(np.zeros((10, 10), np.uint8))
+            arena.put(np.zeros((10, 10), np.uint8))
+            raise RuntimeError("falla a mitad de auditoría")
+    assert live_blocks() == 0
+
+
+def test_put_image_copies_by_strips():
+    from PIL import Image
+
+    page = np.random.default_rng(0).integers(0, 256, size=(1500, 2000), dtype=np.uint8)
+    im = Image.fromarray(page)
+    with PageArena() as arena:
+        tracemalloc.start()
+        desc = arena.put_image(im, strip_rows=128)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        assert np.array_equal(arena.view(desc), page)
+        assert peak < page.nbytes // 4  # sin bytes intermedio de página completa
+        with pytest.raises(ValueError):
+            arena.put_image(im.convert("RGB"))
+    assert live_blocks() == 0
+
+
+def test_dead_page_worker_marks_visual_check_as_error(monkeypatch):
+    from PIL import Image
+
+    from app.core.config import settings
+    from app.services import pdf_auditor as pa
+
+    monkeypatch.setattr(pa, "_iter_pages", lambda *a, **k: iter([Image.new("L", (200, 300), 255)] * 3))
+    monkeypatch.setattr(pa, "_signature_bbox", _die)
+    monkeypatch.setattr(settings, "PAGE_WORKERS", 1)
+    monkeypatch.setattr(pa, "_PAGE_POOL", None)
+    pool = pa._page_pool()
+
+    checks = {}
+    assert pa._find_firma("sin firma", "x.pdf", checks=checks) == (False, None, None)
+    assert checks["firma_visual"] == pa.CHECK_ERROR
+    assert pa._PAGE_POOL is None
+    with pytest.raises(RuntimeError):
+        pool.submit(_checksum, None, 1)  # el pool roto se cerró
+    assert live_blocks() == 0
+
+
+def test_page_pool_matches_in_process(monkeypatch):
+    pytest.importorskip("pdfplumber")
+    from PIL import Image
+
+    from app.core.config import settings
+    from app.services import pdf_auditor as pa
+
+    rnd = random.Random(5)
+    pages = []
+    for k in range(5):
+        img = np.full((1100, 850), 255, np.uint8)
+        if k == 3:
+            for _ in range(30):
+                pts = np.array([[rnd.randint(200, 650), rnd.randint(800, 1000)] for _ in range(4)], np.int32)
+                cv2.polylines(img, [pts], False, 0, rnd.randint(2, 5))
+        pages.append(img)
+    monkeypatch.setattr(pa, "_iter_pages", lambda *a, **k: (Image.fromarray(p) for p in pages))
+
+    monkeypatch.setattr(settings, "PAGE_WORKERS", 0)
+    local = pa._find_signature_region("x.pdf")
+
+    monkeypatch.setattr(settings, "PAGE_WORKERS", 2)
+    monkeypatch.setattr(pa, "_PAGE_POOL", None)
+    try:
+        pooled = pa._find_signature_region("x.pdf")
+        assert live_blocks() == 0  # corte temprano en la página 4: todo liberado
+        monkeypatch.setattr(pa, "_iter_pages", lambda *a, **k: (Image.fromarray(p) for p in pages[:3]))
+        assert pa._find_signature_region("x.pdf") is None
+        assert live_blocks() == 0
+    finally:
+        if pa._PAGE_POOL is not None:
+            pa._PAGE_POOL.shutdown()
+
+    assert local is not None and pooled is not None
+    assert np.array_equal(local, pooled)
+
+
+def test_benchmark_single_run_reports_both_methods():
+    from app.tools.bench_raster_handoff import run_single
+
+    pickled = run_single("pickle", workers=1, width=400, height=500, pages=3, work="media")
+    shared = run_single("shm", workers=1, width=400, height=500, pages=3, work="media")
+    assert pickled["mb_serializados"] > 0.5
+    assert shared["mb_serializados"] < 0.01
+    assert live_blocks() == 0
@@ -0,0 +1,130 @@
+import json
+import subprocess
+import sys
+import textwrap
+from pathlib import Path
+
+import pytest
+
+pytest.importorskip("pdfplumber")
+pytest.importorskip("pdf2image")
+pytest.importorskip("cv2")
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Corre en un proceso aparte para medir su RSS pico (ru_maxrss) sin ruido del runner.
+# pdf2image se reemplaza por un render falso de páginas A4 a 200 DPI (~3.7 MB c/u en gris).
+_CHILD = textwrap.dedent("""
+    import json, resource, sys
+    from PIL import Image
+    from app.services import pdf_auditor as pa
+
+    n_pages = int(sys.argv[1])
+
+    def fake_info(path, **kw):
+        return {"Pages": n_pages, "Page size": "595 x 842 pts (A4)"}
+
+    def fake_convert(path, dpi=200, first_page=1, last_page=1, **kw):
+        w, h = int(595 / 72 * dpi), int(842 / 72 * dpi)
+        return [Image.new("L", (w, h), 255) for _ in range(first_page, last_page + 1)]
+
+    pa.pdfinfo_from_path = fake_info
+    pa.convert_from_path = fake_convert
+    pa.settings.PDF_MAX_PAGES = 0
+
+    found = pa._has_signature_visual("fake.pdf")
+    print(json.dumps({"found": found, "maxrss_kb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}))
+""")
+
+
+def _peak_rss_kb(n_pages: int) -> int:
+    out = subprocess.run(
+        [sys.executable, "-c", _CHILD, str(n_pages)],
+        cwd=ROOT, capture_output=True, text=True, check=True,
+    )
+    data = json.loads(out.stdout.strip().splitlines()[-1])
+    assert data["found"] is False
+    return data["maxrss_kb"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="usa resource.getrusage")
+def test_peak_rss_flat_as_page_count_grows():
+    small = _peak_rss_kb(2)
+    large = _peak_rss_kb(40)
+    # Materializando todo serían ~38 páginas * 3.7 MB extra; en streaming debe quedar plano.
+    assert large - small < 16 * 1024
+
+
+def test_dpi_lowered_to_fit_memory_ceiling():
+    from app.services.pdf_auditor import _dpi_within_budget, RENDER_MIN_DPI
+
+    letter = [(612.0, 792.0)]
+    assert _dpi_within_budget(letter, 200, 64 * 1024 * 1024) == 200
+    assert _dpi_within_budget(letter, 200, 0) == 200
+    lowered = _dpi_within_budget(letter, 200, 1024 * 1024)
+    assert RENDER_MIN_DPI <= lowered < 200
+    assert (612 / 72 * lowered) * (792 / 72 * lowered) <= 1024 * 1024 or lowered == RENDER_MIN_DPI
+
+
+def test_page_sizes_from_pdfinfo():
+    from app.services.pdf_auditor import _page_sizes_pts
+
+    info = {"Pages": 3, "Page    2 size": "842 x 595 pts (A4)", "Page    1 size": "612 x 792 pts (letter)"}
+    assert _page_sizes_pts(info, 3) == [(612.0, 792.0), (842.0, 595.0), (0.0, 0.0)]
+
+
+def _fake_render(monkeypatch, n_pages, signature=False):
+    import numpy as np
+    import cv2
+    from PIL import Image
+
+    from app.services import pdf_auditor as pa
+
+    def fake_info(path, **kw):
+        return {"Pages": n_pages, "Page size": "612 x 792 pts (letter)"}
+
+    def fake_convert(path, dpi=200, first_page=1, last_page=1, **kw):
+        w, h = int(612 / 72 * dpi), int(792 / 72 * dpi)
+        pages = []
+        for _ in range(first_page, last_page + 1):
+            img = np.full((h, w), 255, np.uint8)
+            if signature:
+                # los mismos trazos en coordenadas de página: el área en px² crece con DPI²
+                t = 3 * dpi // 100
+                for k in range(8):
+                    x0, y0 = int(w * (0.2 + 0.08 * (k % 3))), int(h * (0.72 + 0.015 * k))
+                    cv2.rectangle(img, (x0, y0), (x0 + int(w * 0.06) - 1, y0 + t - 1), 0, -1)
+            pages.append(Image.fromarray(img))
+        return pages
+
+    monkeypatch.setattr(pa, "pdfinfo_from_path", fake_info)
+    monkeypatch.setattr(pa, "convert_from_path", fake_convert)
+    return pa
+
+
+def test_page_cap_and_dpi_drop_are_reported(monkeypatch):
+    pa = _fake_render(monkeypatch, n_pages=5)
+    monkeypatch.setattr(pa.settings, "PDF_MAX_PAGES", 3)
+    monkeypatch.setattr(pa.settings, "PDF_RENDER_MAX_MB", 1)
+
+    report = pa._RenderReport()
+    pages = list(pa._iter_pages("x.pdf", dpi=200, report=report))
+    assert len(pages) == 3
+    assert report.paginas_omitidas == 2
+    assert report.dpi_reducido and all(pa._page_dpi(im, 200) == report.dpi_min for im in pages)
+
+    checks = {}
+    found, _, _ = pa._find_firma("sin firma", "x.pdf", checks=checks, report=pa._RenderReport())
+    assert found is False and checks["firma_visual"] == pa.CHECK_LIMITED
+    assert pa._no_verificados({"firma": False}, checks) == ["firma"]
+
+
+def test_area_thresholds_follow_render_dpi(monkeypatch):
+    pa = _fake_render(monkeypatch, n_pages=1, signature=True)
+    monkeypatch.setattr(pa.settings, "PDF_MAX_PAGES", 0)
+    monkeypatch.setattr(pa.settings, "PDF_RENDER_MAX_MB", 0)
+    # Trazos de ~500 px² a 200 DPI: sin escalar, a 100 DPI caerían bajo el mínimo y a 300 sobre el máximo
+    monkeypatch.setattr(pa, "SIG_MIN_AREA", 300)
+    monkeypatch.setattr(pa, "SIG_MAX_AREA", 1000)
+    for dpi in (100, 200, 300):
+        assert pa._find_signature_region("x.pdf", dpi=dpi) is not None, dpi
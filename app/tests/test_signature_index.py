@@ -0,0 +1,173 @@
+import json
+import os
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+
+from app.services.signature_index import MultiIndexHash, SignatureIndex, hamming, signature_hash  # noqa: E402
+
+
+def _firma(seed: int, w: int = 420, h: int = 160) -> "np.ndarray":
+    rnd = random.Random(seed)
+    img = np.full((h, w), 255, np.uint8)
+    pts = np.array([[int(w * t / 30), int(h / 2 + rnd.gauss(0, h / 5))] for t in range(31)], np.int32)
+    cv2.polylines(img, [pts], False, 0, 3)
+    for _ in range(3):
+        c = (rnd.randint(20, w - 20), rnd.randint(20, h - 20))
+        cv2.ellipse(img, c, (rnd.randint(10, 60), rnd.randint(5, 40)), rnd.randint(0, 180), 0, 300, 0, 2)
+    return img
+
+
+def _dist(a: str, b: str) -> int:
+    return hamming(int(a, 16), int(b, 16))
+
+
+def test_hash_is_robust_to_rescan_and_distinguishes_signatures():
+    base = _firma(1)
+    rescaled = cv2.resize(base, (base.shape[1] * 3 // 4, base.shape[0] * 3 // 4), interpolation=cv2.INTER_AREA)
+    noisy = np.clip(base.astype(int) + np.random.default_rng(0).integers(-25, 25, base.shape), 0, 255).astype(np.uint8)
+
+    h = signature_hash(base)
+    assert len(h) == 16
+    assert _dist(h, signature_hash(rescaled)) <= 6
+    assert _dist(h, signature_hash(noisy)) <= 6
+    assert min(_dist(h, signature_hash(_firma(s))) for s in range(2, 12)) > 10
+
+
+def test_multi_index_matches_brute_force():
+    rnd = random.Random(7)
+    values = [rnd.getrandbits(64) for _ in range(2000)]
+    mih = MultiIndexHash(chunks=5)
+    for i, v in enumerate(values):
+        mih.add(v, i)
+    for q in values[:20] + [rnd.getrandbits(64) for _ in range(5)]:
+        for radius in (0, 6, 8, 20):
+            got = sorted(i for _, i in mih.search(q, radius))
+            assert got == [i for i, v in enumerate(values) if hamming(q, v) <= radius]
+
+
+def test_multi_index_examines_few_candidates():
+    rnd = random.Random(11)
+    mih = MultiIndexHash(chunks=5)
+    n = 20000
+    for i in range(n):
+        mih.add(rnd.getrandbits(64), i)
+    q = rnd.getrandbits(64)
+    # Copias a distancia 8 con los bits cambiados repartidos en todos los trozos
+    near = [q ^ sum(1 << b for b in rnd.sample(range(64), 8)) for _ in range(10)]
+    for j, v in enumerate(near):
+        mih.add(v, n + j)
+
+    got = sorted(i for _, i in mih.search(q, 8))
+    assert got == list(range(n, n + 10))
+    # 5 trozos de ~13 bits, vecinos a distancia <= 1: ~70/8192 del índice, no un recorrido
+    assert mih.last_candidates < mih.size // 50
+
+
+def test_index_persists_and_filters_same_patient(tmp_path):
+    path = tmp_path / "firmas_index.jsonl"
+    h = signature_hash(_firma(1))
+    idx = SignatureIndex(str(path))
+    idx.add(h, clave="a.pdf", paciente="111")
+    idx.add(h, clave="b.pdf", paciente="222")
+    idx.add(signature_hash(_firma(5)), clave="c.pdf", paciente="333")
+
+    # Otro proceso / reinicio: lee el archivo
+    other = SignatureIndex(str(path))
+    assert len(other) == 3
+    matches = other.query(h, clave="nuevo.pdf", paciente="111", max_dist=8, top_k=5)
+    assert [m["archivo"] for m in matches] == ["b.pdf"]
+    assert matches[0]["distancia"] == 0
+
+    # Lo anexado por `other` lo ve `idx` sin recargar
+    other.add(h, clave="d.pdf", paciente="444")
+    assert {m["archivo"] for m in idx.query(h, clave="x.pdf", max_dist=8, top_k=5)} == {"a.pdf", "b.pdf", "d.pdf"}
+
+
+def test_reaudited_file_replaces_previous_hash(tmp_path):
+    idx = SignatureIndex(str(tmp_path / "idx.jsonl"))
+    h1, h2 = signature_hash(_firma(1)), signature_hash(_firma(9))
+    idx.add(h1, clave="lote/a.pdf", paciente="1")
+    idx.add(h2, clave="lote/a.pdf", paciente="1")
+    assert idx.query(h1, clave="z.pdf", max_dist=4, top_k=5) == []
+    assert [m["archivo"] for m in idx.query(h2, clave="z.pdf", max_dist=4, top_k=5)] == ["a.pdf"]
+
+
+def test_same_basename_in_different_folders_are_distinct_documents(tmp_path):
+    idx = SignatureIndex(str(tmp_path / "idx.jsonl"))
+    h = signature_hash(_firma(1))
+    idx.add(h, clave="sede_norte/1001.pdf", paciente="111")
+    idx.add(h, clave="sede_sur/1001.pdf", paciente="222")
+
+    assert len(idx) == 2  # ninguno pisa al otro
+    matches = idx.query(h, clave="sede_sur/1001.pdf", paciente="222", max_dist=4, top_k=5)
+    assert [(m["clave"], m["archivo"]) for m in matches] == [("sede_norte/1001.pdf", "1001.pdf")]
+
+
+def test_records_without_key_fall_back_to_filename(tmp_path):
+    path = tmp_path / "idx.jsonl"
+    h = signature_hash(_firma(1))
+    path.write_text(json.dumps({"hash": h, "archivo": "viejo.pdf", "paciente": "1"}) + "\n", encoding="utf-8")
+    idx = SignatureIndex(str(path))
+    assert [m["clave"] for m in idx.query(h, clave="nuevo.pdf", max_dist=4, top_k=5)] == ["viejo.pdf"]
+    assert idx.query(h, clave="viejo.pdf", max_dist=4, top_k=5) == []
+
+
+def test_process_path_reports_reused_signature(tmp_path, monkeypatch):
+    pytest.importorskip("pdfplumber")
+    pytest.importorskip("fastapi")
+    from PIL import Image
+
+    from app.core.config import settings
+    from app.services import pdf_auditor as pa
+    from app.services.pdf_processor import process_path
+    from app.tools.load_test import make_text_pdf
+
+    rnd = random.Random(3)
+    page = np.full((1100, 850), 255, np.uint8)
+    for _ in range(30):
+        pts = np.array([[rnd.randint(200, 650), rnd.randint(800, 1000)] for _ in range(4)], np.int32)
+        cv2.polylines(page, [pts], False, 0, rnd.randint(2, 5))
+    monkeypatch.setattr(pa, "_iter_pages", lambda *a, **k: iter([Image.fromarray(page)]))
+    monkeypatch.setattr(settings, "SIG_INDEX_FILE", str(tmp_path / "firmas_index.jsonl"))
+
+    def receipt(cc: str) -> bytes:
+        return make_text_pdf(lines=[
+            "DISPENSACION DE MEDICAMENTOS", "Fecha: 12/03/2024", f"Paciente: CC {cc}",
+            "MEDICAMENTOS AUTORIZADOS   PRESENTACION   CANTIDAD", "ACETAMINOFEN 500 MG   TABLETA   30",
+        ])
+
+    paths = []
+    for name, cc in (("p1.pdf", "11111111"), ("p2.pdf", "22222222")):
+        (tmp_path / name).write_bytes(receipt(cc))
+        paths.append(str(tmp_path / name))
+
+    first = process_path(paths[0], reference={}, log=False)["result"]
+    second = process_path(paths[1], reference={}, log=False)["result"]
+
+    assert first["firma_method"] == "visual" and first["firmas_similares"] == []
+    assert [m["archivo"] for m in second["firmas_similares"]] == ["p1.pdf"]
+    assert second["firmas_similares"][0]["paciente"] == "11111111"
+    assert "Firma casi idéntica" in second["observaciones"]
+
+    # Sin cédula, el número de pedido no identifica al paciente: queda como desconocido
+    for name, pedido in (("q1.pdf", "3153711068"), ("q2.pdf", "3153799999")):
+        (tmp_path / name).write_bytes(make_text_pdf(lines=[
+            "DISPENSACION DE MEDICAMENTOS", f"Pedido No. {pedido}", "Fecha: 12/03/2024",
+            "MEDICAMENTOS AUTORIZADOS   PRESENTACION   CANTIDAD", "ACETAMINOFEN 500 MG   TABLETA   30",
+        ]))
+    process_path(str(tmp_path / "q1.pdf"), reference={}, log=False)
+    third = process_path(str(tmp_path / "q2.pdf"), reference={}, log=False)["result"]
+    assert third["extraido"]["cedula"] == ""
+    assert next(m for m in third["firmas_similares"] if m["archivo"] == "q1.pdf")["paciente"] == ""
+    assert "cédula no extraída" in third["observaciones"]
+
+    # Mismo nombre en otra carpeta: es otro documento y se reporta (con su ruta como clave)
+    (tmp_path / "otra").mkdir()
+    (tmp_path / "otra" / "p1.pdf").write_bytes(receipt("33333333"))
+    fourth = process_path(str(tmp_path / "otra" / "p1.pdf"), reference={}, log=False)["result"]
+    p1 = [m for m in fourth["firmas_similares"] if m["archivo"] == "p1.pdf"]
+    assert [m["clave"] for m in p1] == [os.path.realpath(paths[0])]
@@ -0,0 +1,105 @@
+import json
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+cv2 = pytest.importorskip("cv2")
+pytest.importorskip("pdfplumber")
+
+from PIL import Image  # noqa: E402
+
+from app.services import pdf_auditor as pa  # noqa: E402
+from app.tools import tune_signature as ts  # noqa: E402
+
+
+def _page(seed: int, firma: bool) -> Image.Image:
+    rnd = random.Random(seed)
+    img = np.full((1100, 850), 255, np.uint8)
+    for _ in range(4):
+        y = rnd.randint(650, 1050)
+        cv2.line(img, (40, y), (810, y), 0, rnd.randint(1, 3))
+    if firma:
+        for _ in range(rnd.randint(4, 40)):
+            pts = np.array([[rnd.randint(200, 650), rnd.randint(800, 1000)] for _ in range(4)], np.int32)
+            cv2.polylines(img, [pts], False, 0, rnd.randint(2, 5))
+    return Image.fromarray(img)
+
+
+@pytest.fixture
+def corpus(monkeypatch):
+    items = [(f"doc{i}.pdf", int(i % 3 != 0)) for i in range(12)]
+    pages = {p: [_page(i * 10 + k, bool(lab) and k == 1) for k in range(2)] for i, (p, lab) in enumerate(items)}
+    monkeypatch.setattr(pa, "_iter_pages", lambda path, dpi=pa.RENDER_DPI, **kw: iter(pages[path]))
+    return items
+
+
+def test_sweep_matches_live_detector(corpus):
+    bands = list(pa.SIG_ROI_BANDS)
+    per_doc = [ts.extract_features(p, pa.RENDER_DPI, bands) for p, _ in corpus]
+    data = ts.stack_features(corpus, per_doc, len(bands))
+    grid = {
+        "SIG_MIN_AREA": [pa.SIG_MIN_AREA, 10],
+        "SIG_MAX_AREA": [pa.SIG_MAX_AREA],
+        "SIG_MIN_STROKES": [pa.SIG_MIN_STROKES, 1, 30],
+        "SIG_MIN_COMPLEX": [pa.SIG_MIN_COMPLEX],
+        "SIG_MAX_COMPLEX": [pa.SIG_MAX_COMPLEX],
+    }
+    rows = ts.sweep(data, bands, grid, max_bands=len(bands), workers=1)
+    assert len(rows) == 2 * 3 * 7  # áreas x trazos x subconjuntos de 3 bandas
+
+    live = [pa._has_signature_visual(p) for p, _ in corpus]
+    labels = [bool(lab) for _, lab in corpus]
+    expected_tp = sum(lv and lab for lv, lab in zip(live, labels))
+    expected_fp = sum(lv and not lab for lv, lab in zip(live, labels))
+
+    row = next(
+        r for r in rows
+        if r["SIG_MIN_AREA"] == pa.SIG_MIN_AREA and r["SIG_MIN_STROKES"] == pa.SIG_MIN_STROKES
+        and len(r["SIG_ROI_BANDS"]) == len(bands)
+    )
+    assert (row["tp"], row["fp"]) == (expected_tp, expected_fp)
+    assert row["lat_ms_mean"] >= 0
+
+
+def test_write_best_only_writes_chosen_params(tmp_path):
+    rows = [
+        {**{k: 1 for k in pa.SIG_PARAM_KEYS}, "SIG_ROI_BANDS": [[0.5, 0.9]], "tp": 5,
+         "precision": 0.8, "recall": 1.0, "f1": 0.89, "lat_ms_mean": 10.0, "lat_ms_p95": 12.0},
+        {**{k: 2 for k in pa.SIG_PARAM_KEYS}, "SIG_ROI_BANDS": [[0.6, 0.9]], "tp": 4,
+         "precision": 1.0, "recall": 0.8, "f1": 0.89, "lat_ms_mean": 5.0, "lat_ms_p95": 6.0},
+    ]
+    best = ts.pick_best(rows, min_precision=0.9)
+    assert best is rows[1]
+    assert ts.pick_best(rows, min_precision=1.1) is None
+
+    out = tmp_path / "signature_params.json"
+    ts.write_best(best, str(out))
+    assert json.loads(out.read_text())["SIG_MIN_STROKES"] == 2
+    loaded = pa._load_sig_params(str(out))
+    assert set(loaded) == set(pa.SIG_PARAM_KEYS)
+    assert loaded["SIG_ROI_BANDS"] == [(0.6, 0.9)]
+
+
+@pytest.mark.parametrize("bad", [
+    {"SIG_ROI_BANDS": []},
+    {"SIG_ROI_BANDS": [[0.9, 0.5]]},
+    {"SIG_MIN_STROKES": "5"},
+    {"SIG_MIN_STROKES": 0},
+    {"SIG_MIN_AREA": 500, "SIG_MAX_AREA": 100},
+    {"SIG_MIN_COMPLEX": True},
+    ["SIG_MIN_AREA", 5],
+])
+def test_invalid_params_file_falls_back_to_defaults(tmp_path, bad):
+    path = tmp_path / "signature_params.json"
+    path.write_text(json.dumps({**bad, "SIG_MAX_COMPLEX": 900} if isinstance(bad, dict) else bad))
+    assert pa._load_sig_params(str(path)) == {}
+
+
+def test_live_detector_stops_after_first_sufficient_threshold(monkeypatch):
+    img = np.asarray(_page(3, True))
+    calls = []
+    real = pa._clean_contours
+    monkeypatch.setattr(pa, "_clean_contours", lambda th: calls.append(1) or real(th))
+    assert pa._signature_bbox(img, pa.SIG_ROI_BANDS) is not None
+    assert len(calls) < 2 * len(pa.SIG_ROI_BANDS)
@@ -0,0 +1,155 @@
+"""
+Benchmark: traspaso de páginas a workers por pickle vs memoria compartida (page_buffers).
+
+Para cada combinación (método, workers, tamaño de página) corre un proceso nuevo que
+envía N páginas sintéticas a un ProcessPoolExecutor con la misma ventana en vuelo que
+pdf_auditor._map_pages (workers + 1) y mide:
+  - ms por página (pared) y MB serializados por las tuberías hacia los workers,
+  - RSS pico del padre y RSS pico de los workers (ru_maxrss, proceso limpio por corrida).
+
+    python -m app.tools.bench_raster_handoff
+    python -m app.tools.bench_raster_handoff --workers 1 2 4 8 --dpi 200 300 600 --pages 40 --work contornos
+"""
+import argparse
+import json
+import pickle
+import subprocess
+import sys
+import time
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from app.services.page_buffers import PageArena, SharedPage, run_on_page
+
+try:
+    import resource
+except ImportError:  # Windows: sin ru_maxrss, se reporta solo tiempo y bytes
+    resource = None
+
+LETTER_IN = (8.5, 11.0)
+
+
+def _page(width: int, height: int, seed: int) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    page = np.full((height, width), 255, np.uint8)
+    rows = rng.integers(0, height, size=height // 40)
+    page[rows, :] = 0
+    return page
+
+
+def _work_media(gray: np.ndarray) -> float:
+    """Trabajo mínimo: expone el costo del traspaso."""
+    h = gray.shape[0]
+    return float(gray[int(h * 0.55):int(h * 0.9)].mean())
+
+
+def _work_contornos(gray: np.ndarray) -> Optional[tuple]:
+    """Trabajo real: el barrido de firma visual del auditor."""
+    from app.services import pdf_auditor as pa
+    return pa._signature_bbox(gray, pa.SIG_ROI_BANDS)
+
+
+WORKS = {"media": _work_media, "contornos": _work_contornos}
+
+
+def _maxrss_mb(who: str) -> float:
+    if resource is None:
+        return float("nan")
+    rss = resource.getrusage(getattr(resource, who)).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+
+def run_single(method: str, workers: int, width: int, height: int, pages: int, work: str) -> Dict[str, Any]:
+    fn = WORKS[work]
+    # bytes que viajan por la tubería por página (medidos una vez, fuera del cronómetro)
+    if method == "pickle":
+        per_page = len(pickle.dumps(_page(width, height, 0), protocol=pickle.HIGHEST_PROTOCOL))
+    else:
+        per_page = len(pickle.dumps(SharedPage("psm_00000000", (height, width)), protocol=pickle.HIGHEST_PROTOCOL))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # calentamiento: arranque de procesos fuera de la medición
+        list(pool.map(_work_media, [np.zeros((8, 8), np.uint8)] * workers))
+        rss_before = _maxrss_mb("RUSAGE_SELF")
+
+        t0 = time.perf_counter()
+        pending: deque = deque()
+        with PageArena() as arena:
+            for i in range(pages):
+                page = _page(width, height, i)
+                if method == "pickle":
+                    pending.append((None, pool.submit(fn, page)))
+                else:
+                    desc = arena.put(page)
+                    pending.append((desc, pool.submit(run_on_page, desc, fn)))
+                del page
+                if len(pending) > workers:
+                    desc, fut = pending.popleft()
+                    fut.result()
+                    if desc is not None:
+                        arena.free(desc)
+            while pending:
+                desc, fut = pending.popleft()
+                fut.result()
+                if desc is not None:
+                    arena.free(desc)
+        elapsed = time.perf_counter() - t0
+
+    return {
+        "metodo": method,
+        "workers": workers,
+        "pagina": f"{width}x{height}",
+        "mb_pagina": round(width * height / 1e6, 2),
+        "paginas": pages,
+        "ms_por_pagina": round(elapsed * 1000 / pages, 2),
+        "mb_serializados": round(per_page * pages / 1e6, 3),
+        "rss_padre_mb": round(_maxrss_mb("RUSAGE_SELF"), 1),
+        "rss_padre_delta_mb": round(_maxrss_mb("RUSAGE_SELF") - rss_before, 1),
+        "rss_worker_max_mb": round(_maxrss_mb("RUSAGE_CHILDREN"), 1),
+    }
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.tools.bench_raster_handoff", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--dpi", type=int, nargs="+", default=[200, 300, 600], help="Tamaño de página (carta) por DPI")
+    parser.add_argument("--pages", type=int, default=24)
+    parser.add_argument("--work", choices=sorted(WORKS), default="media")
+    parser.add_argument("--json", dest="json_out", help="Guarda los resultados en este archivo")
+    parser.add_argument("--single", nargs=4, metavar=("METODO", "WORKERS", "ANCHO", "ALTO"), help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.single:
+        method, workers, width, height = args.single
+        print(json.dumps(run_single(method, int(workers), int(width), int(height), args.pages, args.work)))
+        return 0
+
+    rows: List[Dict[str, Any]] = []
+    for dpi in args.dpi:
+        width, height = int(LETTER_IN[0] * dpi), int(LETTER_IN[1] * dpi)
+        for workers in args.workers:
+            for method in ("pickle", "shm"):
+                # proceso nuevo por corrida: ru_maxrss es un pico acumulado
+                out = subprocess.run(
+                    [sys.executable, "-m", "app.tools.bench_raster_handoff", "--single", method, str(workers),
+                     str(width), str(height), "--pages", str(args.pages), "--work", args.work],
+                    capture_output=True, text=True, check=True,
+                )
+                row = json.loads(out.stdout.strip().splitlines()[-1])
+                row["dpi"] = dpi
+                rows.append(row)
+                print(f"dpi={dpi:<4} workers={workers:<2} {method:<6} "
+                      f"{row['ms_por_pagina']:>8} ms/pág  {row['mb_serializados']:>9} MB serializados  "
+                      f"RSS padre Δ {row['rss_padre_delta_mb']:>6} MB  RSS worker {row['rss_worker_max_mb']:>6} MB",
+                      flush=True)
+
+    if args.json_out:
+        with open(args.json_out, "w", encoding="utf-8") as fh:
+            json.dump(rows, fh, ensure_ascii=False, indent=2)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
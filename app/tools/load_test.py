@@ -0,0 +1,510 @@
+"""
+Generador de carga HTTP autocontenido para dimensionar el despliegue.
+
+Envía tráfico mixto a /audit/pdf, /upload-pdf y /report/download con PDFs sintéticos
+(con capa de texto, escaneados sin texto, duplicados y sobredimensionados) a una
+concurrencia dada, y reporta throughput, latencias p50/p95/p99, tasa de errores y
+responsividad del servidor. No requiere servicios externos ni dependencias extra.
+
+En proceso, el lag se mide en el mismo event loop que corre la app (event_loop_lag). Con
+--url ese loop es el del generador, no el de uvicorn: se reporta como lag_cliente (solo
+sirve para ver si el generador se saturó) y la responsividad del servidor se estima con
+una sonda de baja frecuencia a GET / (sonda_servidor).
+
+Modos:
+    # En proceso: la app de app/main.py corre en el mismo event loop (cliente ASGI local).
+    python -m app.tools.load_test --requests 200 --concurrency 8
+
+    # Contra un servidor local (p. ej. para comparar --workers de uvicorn):
+    python -m uvicorn app.main:app --workers 4 --port 8000
+    python -m app.tools.load_test --url http://127.0.0.1:8000 --duration 60 --concurrency 32
+
+En modo en proceso, uploads y Excel se redirigen a un directorio temporal para no
+ensuciar el reporte real. En modo --url, el servidor escribe donde esté configurado.
+"""
+import argparse
+import asyncio
+import json
+import math
+import random
+import sys
+import tempfile
+import time
+import uuid
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from urllib.parse import urlsplit
+
+API_PREFIX = "/api/v1"
+
+# Mezcla de tráfico por defecto (pesos relativos)
+DEFAULT_MIX = {
+    "texto": 50,        # PDF con capa de texto -> /audit/pdf
+    "escaneado": 20,    # PDF solo imagen (fuerza OCR) -> /audit/pdf
+    "duplicado": 10,    # mismo archivo ya enviado -> /upload-pdf
+    "grande": 5,        # PDF sobredimensionado -> /audit/pdf
+    "reporte": 15,      # GET /report/download
+}
+
+
+# =========================
+# PDFs sintéticos
+# =========================
+def _build_pdf(objects: List[bytes]) -> bytes:
+    """Ensambla un PDF mínimo (objetos 1..n, catálogo = obj 1) con tabla xref válida."""
+    out = bytearray(b"%PDF-1.4\n%\xe2\xe3\xcf\xd3\n")
+    offsets = []
+    for i, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % i + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for off in offsets:
+        out += b"%010d 00000 n \n" % off
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def _stream(data: bytes, extra: bytes = b"") -> bytes:
+    return b"<< /Length %d %s>>\nstream\n" % (len(data), extra) + data + b"\nendstream"
+
+
+def _receipt_lines(seed: int) -> List[str]:
+    rnd = random.Random(seed)
+    return [
+        "DISPENSACION DE MEDICAMENTOS",
+        f"Pedido No. {rnd.randint(3150000000, 3159999999)}",
+        f"Fecha: {rnd.randint(1, 28):02d}/{rnd.randint(1, 12):02d}/2024",
+        f"Paciente: Juan Perez  Identificacion CC {rnd.randint(10000000, 99999999)}",
+        "MEDICAMENTOS AUTORIZADOS   PRESENTACION   CANTIDAD",
+        f"ACETAMINOFEN 500 MG   TABLETA   {rnd.randint(1, 90)}",
+        "Firma del paciente: ____________________",
+    ]
+
+
+def make_text_pdf(seed: int = 0, padding_bytes: int = 0, lines: Optional[List[str]] = None) -> bytes:
+    """Tirilla con capa de texto. `padding_bytes` agrega un stream sin usar (archivo grande)."""
+    lines = lines if lines is not None else _receipt_lines(seed)
+    ops = [b"BT /F1 11 Tf 50 760 Td 14 TL"]
+    for ln in lines:
+        ops.append(b"(" + ln.encode("latin-1").replace(b"(", b"\\(").replace(b")", b"\\)") + b") Tj T*")
+    ops.append(b"ET")
+    content = b"\n".join(ops)
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>",
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>",
+        _stream(content),
+    ]
+    if padding_bytes > 0:
+        objects.append(_stream(random.Random(seed).randbytes(padding_bytes)))
+    return _build_pdf(objects)
+
+
+def make_scanned_pdf(seed: int = 0, width: int = 850, height: int = 1100) -> bytes:
+    """Página con una sola imagen en gris (sin capa de texto) para forzar OCR/visión."""
+    rnd = random.Random(seed)
+    rows = []
+    for y in range(height):
+        if y % 40 < 3 or (height * 0.75 < y < height * 0.8 and rnd.random() < 0.5):
+            row = bytes(rnd.choice((0, 60, 255)) for _ in range(width))
+        else:
+            row = b"\xff" * width
+        rows.append(row)
+    pixels = zlib.compress(b"".join(rows), 6)
+    content = b"q 612 0 0 792 0 0 cm /Im0 Do Q"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] "
+        b"/Resources << /XObject << /Im0 4 0 R >> >> /Contents 5 0 R >>",
+        _stream(pixels, b"/Type /XObject /Subtype /Image /Width %d /Height %d "
+                        b"/ColorSpace /DeviceGray /BitsPerComponent 8 /Filter /FlateDecode " % (width, height)),
+        _stream(content),
+    ]
+    return _build_pdf(objects)
+
+
+def _multipart(filename: str, data: bytes) -> Tuple[bytes, str]:
+    boundary = uuid.uuid4().hex
+    body = (
+        f"--{boundary}\r\n"
+        f'Content-Disposition: form-data; name="file"; filename="{filename}"\r\n'
+        "Content-Type: application/pdf\r\n\r\n"
+    ).encode("utf-8") + data + f"\r\n--{boundary}--\r\n".encode("utf-8")
+    return body, f"multipart/form-data; boundary={boundary}"
+
+
+# =========================
+# Clientes
+# =========================
+# Un cliente es: async (method, path, headers, body) -> (status, bytes_respuesta)
+Client = Callable[[str, str, Dict[str, str], bytes], Awaitable[Tuple[int, int]]]
+
+
+def asgi_client(app: Any) -> Client:
+    """Cliente ASGI local: llama a la app en el mismo event loop, sin sockets."""
+    async def request(method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, int]:
+        path_only, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": method,
+            "scheme": "http",
+            "path": path_only,
+            "raw_path": path_only.encode("utf-8"),
+            "query_string": query.encode("utf-8"),
+            "root_path": "",
+            "headers": [(k.lower().encode("latin-1"), v.encode("latin-1")) for k, v in headers.items()],
+            "client": ("127.0.0.1", 0),
+            "server": ("loadtest", 80),
+        }
+        sent = False
+        done = asyncio.Event()
+        status = 0
+        size = 0
+
+        async def receive() -> Dict[str, Any]:
+            nonlocal sent
+            if not sent:
+                sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            await done.wait()  # el "cliente" se desconecta solo al terminar la respuesta
+            return {"type": "http.disconnect"}
+
+        async def send(message: Dict[str, Any]) -> None:
+            nonlocal status, size
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            elif message["type"] == "http.response.body":
+                size += len(message.get("body", b""))
+                if not message.get("more_body", False):
+                    done.set()
+
+        await app(scope, receive, send)
+        return status, size
+
+    return request
+
+
+def http_client(base_url: str) -> Client:
+    """Cliente HTTP/1.1 mínimo sobre asyncio (una conexión por request, Connection: close)."""
+    parts = urlsplit(base_url)
+    host = parts.hostname or "127.0.0.1"
+    port = parts.port or 80
+    base_path = parts.path.rstrip("/")
+
+    async def request(method: str, path: str, headers: Dict[str, str], body: bytes) -> Tuple[int, int]:
+        reader, writer = await asyncio.open_connection(host, port)
+        try:
+            head = [f"{method} {base_path}{path} HTTP/1.1", f"Host: {host}:{port}", "Connection: close",
+                    f"Content-Length: {len(body)}"]
+            head += [f"{k}: {v}" for k, v in headers.items()]
+            writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+            await writer.drain()
+            status_line = await reader.readline()
+            status = int(status_line.split()[1])
+            size = len(await reader.read())
+            return status, size
+        finally:
+            writer.close()
+
+    return request
+
+
+# =========================
+# Métricas
+# =========================
+@dataclass
+class Sample:
+    kind: str
+    endpoint: str
+    status: int
+    latency_s: float
+    error: Optional[str] = None
+
+
+@dataclass
+class LagMonitor:
+    """Mide cuánto se atrasa el event loop respecto a un sleep periódico."""
+    interval_s: float = 0.05
+    lags_s: List[float] = field(default_factory=list)
+
+    async def run(self, stop: asyncio.Event) -> None:
+        loop = asyncio.get_running_loop()
+        while not stop.is_set():
+            t0 = loop.time()
+            await asyncio.sleep(self.interval_s)
+            self.lags_s.append(max(0.0, loop.time() - t0 - self.interval_s))
+
+
+@dataclass
+class ProbeMonitor:
+    """Sonda del lado del servidor: latencia de un GET trivial, a baja frecuencia, durante la carga."""
+    client: Client
+    path: str = "/"
+    interval_s: float = 0.25
+    latencies_s: List[float] = field(default_factory=list)
+    errors: int = 0
+
+    async def run(self, stop: asyncio.Event, timeout_s: float = 30.0) -> None:
+        while not stop.is_set():
+            t0 = time.perf_counter()
+            try:
+                status, _ = await asyncio.wait_for(self.client("GET", self.path, {}, b""), timeout_s)
+                if status >= 400:
+                    self.errors += 1
+                else:
+                    self.latencies_s.append(time.perf_counter() - t0)
+            except Exception:
+                self.errors += 1
+            try:
+                await asyncio.wait_for(stop.wait(), self.interval_s)
+            except asyncio.TimeoutError:
+                pass
+
+
+def percentile(values: List[float], p: float) -> float:
+    """Percentil por rango más cercano (valores sin ordenar)."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, math.ceil(p / 100.0 * len(ordered)) - 1))
+    return ordered[k]
+
+
+def _latency_stats(values: List[float]) -> Dict[str, float]:
+    return {
+        "p50_ms": round(percentile(values, 50) * 1000, 1),
+        "p95_ms": round(percentile(values, 95) * 1000, 1),
+        "p99_ms": round(percentile(values, 99) * 1000, 1),
+        "max_ms": round(max(values) * 1000, 1) if values else 0.0,
+    }
+
+
+def summarize(samples: List[Sample], elapsed_s: float, lags_s: List[float]) -> Dict[str, Any]:
+    def _block(group: List[Sample]) -> Dict[str, Any]:
+        errors = [s for s in group if s.error or s.status >= 400]
+        return {
+            "requests": len(group),
+            "errores": len(errors),
+            "tasa_error": round(len(errors) / len(group), 4) if group else 0.0,
+            "status": dict(Counter(str(s.status) if not s.error else "exc" for s in group)),
+            **_latency_stats([s.latency_s for s in group]),
+        }
+
+    by_endpoint: Dict[str, List[Sample]] = {}
+    by_kind: Dict[str, List[Sample]] = {}
+    for s in samples:
+        by_endpoint.setdefault(s.endpoint, []).append(s)
+        by_kind.setdefault(s.kind, []).append(s)
+
+    return {
+        "segundos": round(elapsed_s, 2),
+        "throughput_rps": round(len(samples) / elapsed_s, 2) if elapsed_s > 0 else 0.0,
+        "total": _block(samples),
+        "por_endpoint": {k: _block(v) for k, v in sorted(by_endpoint.items())},
+        "por_tipo": {k: _block(v) for k, v in sorted(by_kind.items())},
+        "event_loop_lag": _latency_stats(lags_s),
+    }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = [
+        f"Duración: {report['segundos']} s   Throughput: {report['throughput_rps']} req/s",
+        f"{'grupo':<28}{'req':>7}{'err%':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}  (ms)",
+    ]
+
+    def _row(name: str, b: Dict[str, Any]) -> str:
+        return (f"{name:<28}{b['requests']:>7}{b['tasa_error'] * 100:>7.1f}%"
+                f"{b['p50_ms']:>9}{b['p95_ms']:>9}{b['p99_ms']:>9}{b['max_ms']:>9}")
+
+    lines.append(_row("TOTAL", report["total"]))
+    for k, b in report["por_endpoint"].items():
+        lines.append(_row(k, b))
+    for k, b in report["por_tipo"].items():
+        lines.append(_row(f"tipo:{k}", b))
+    if "sonda_servidor" in report:
+        probe = report["sonda_servidor"]
+        lines.append(f"Sonda servidor GET / (ms): p50={probe['p50_ms']} p95={probe['p95_ms']} "
+                     f"p99={probe['p99_ms']} max={probe['max_ms']} ({probe['sondas']} sondas, {probe['errores']} errores)")
+        lag = report["lag_cliente"]
+        lines.append(f"Lag event loop del generador (ms): p95={lag['p95_ms']} max={lag['max_ms']}")
+    else:
+        lag = report["event_loop_lag"]
+        lines.append(f"Lag event loop de la app (ms): p50={lag['p50_ms']} p95={lag['p95_ms']} "
+                     f"p99={lag['p99_ms']} max={lag['max_ms']}")
+    return "\n".join(lines)
+
+
+# =========================
+# Generador de carga
+# =========================
+class TrafficMix:
+    """Construye (kind, method, path, headers, body) según la mezcla configurada."""
+
+    def __init__(self, mix: Dict[str, int], oversized_mb: float, corpus: Optional[str] = None, seed: int = 0):
+        self.kinds = [k for k, w in mix.items() if w > 0]
+        self.weights = [mix[k] for k in self.kinds]
+        self.rnd = random.Random(seed)
+        self.counter = 0
+        self.oversized_bytes = int(oversized_mb * 1024 * 1024)
+        self.corpus = sorted(Path(corpus).glob("*.pdf")) if corpus else []
+        # Cuerpos pre-generados para que el costo de construirlos no contamine la medición
+        self._text = [make_text_pdf(seed=i) for i in range(8)]
+        self._scanned = [make_scanned_pdf(seed=i) for i in range(2)]
+        self._big = make_text_pdf(seed=99, padding_bytes=self.oversized_bytes) if "grande" in self.kinds else b""
+        self._dup = ("loadtest_duplicado.pdf", self._text[0])
+
+    def next(self) -> Tuple[str, str, str, Dict[str, str], bytes]:
+        self.counter += 1
+        kind = self.rnd.choices(self.kinds, weights=self.weights)[0]
+        if kind == "reporte":
+            return kind, "GET", f"{API_PREFIX}/report/download", {}, b""
+
+        endpoint = f"{API_PREFIX}/audit/pdf"
+        if kind == "texto":
+            if self.corpus:
+                path = self.rnd.choice(self.corpus)
+                name, data = f"loadtest_{self.counter}_{path.name}", path.read_bytes()
+            else:
+                name, data = f"loadtest_texto_{self.counter}.pdf", self.rnd.choice(self._text)
+        elif kind == "escaneado":
+            name, data = f"loadtest_escaneado_{self.counter}.pdf", self.rnd.choice(self._scanned)
+        elif kind == "grande":
+            name, data = f"loadtest_grande_{self.counter}.pdf", self._big
+        else:  # duplicado
+            name, data = self._dup
+            endpoint = f"{API_PREFIX}/upload-pdf"
+        body, ctype = _multipart(name, data)
+        return kind, "POST", endpoint, {"Content-Type": ctype}, body
+
+
+async def run_load(
+    client: Client,
+    traffic: TrafficMix,
+    concurrency: int = 8,
+    total_requests: Optional[int] = 100,
+    duration_s: Optional[float] = None,
+    timeout_s: float = 120.0,
+    probe_path: Optional[str] = None,
+) -> Dict[str, Any]:
+    """
+    Ejecuta la carga con `concurrency` usuarios concurrentes hasta N requests o duración.
+    Con `probe_path` (servidor remoto) el lag local se reporta como lag_cliente y se agrega
+    sonda_servidor con la latencia de ese GET.
+    """
+    samples: List[Sample] = []
+    monitor = LagMonitor()
+    probe = ProbeMonitor(client, probe_path) if probe_path else None
+    stop = asyncio.Event()
+    issued = 0
+    t_start = time.perf_counter()
+    deadline = t_start + duration_s if duration_s else None
+
+    def _more() -> bool:
+        if deadline is not None and time.perf_counter() >= deadline:
+            return False
+        return total_requests is None or issued < total_requests
+
+    async def user() -> None:
+        nonlocal issued
+        while _more():
+            issued += 1
+            kind, method, path, headers, body = traffic.next()
+            endpoint = path.rsplit(API_PREFIX, 1)[-1]
+            t0 = time.perf_counter()
+            try:
+                status, _ = await asyncio.wait_for(client(method, path, headers, body), timeout_s)
+                samples.append(Sample(kind, endpoint, status, time.perf_counter() - t0))
+            except Exception as e:
+                samples.append(Sample(kind, endpoint, 0, time.perf_counter() - t0, error=f"{type(e).__name__}: {e}"))
+
+    lag_task = asyncio.create_task(monitor.run(stop))
+    probe_task = asyncio.create_task(probe.run(stop)) if probe else None
+    await asyncio.gather(*(user() for _ in range(max(1, concurrency))))
+    stop.set()
+    await lag_task
+    report = summarize(samples, time.perf_counter() - t_start, monitor.lags_s)
+    if probe_task is not None:
+        await probe_task
+        report["lag_cliente"] = report.pop("event_loop_lag")
+        report["sonda_servidor"] = {
+            "sondas": len(probe.latencies_s) + probe.errors,
+            "errores": probe.errors,
+            **_latency_stats(probe.latencies_s),
+        }
+    return report
+
+
+def _isolated_app(workdir: Path) -> Any:
+    """Importa la app redirigiendo uploads, Excel e índice de firmas a `workdir` (modo en proceso)."""
+    from app.core.config import settings
+    from app.services import audit_logger, signature_index
+    from app.api.v1 import routes
+    from app.main import app
+
+    settings.UPLOAD_DIR = str(workdir / "uploads")
+    audit_logger.XLSX_PATH = workdir / "resultados_auditoria.xlsx"
+    routes.XLSX_PATH = audit_logger.XLSX_PATH
+    # Las firmas sintéticas no deben entrar al índice real (cruzarían con auditorías reales)
+    settings.SIG_INDEX_FILE = str(workdir / "firmas_index.jsonl")
+    signature_index._INDEX = None
+    return app
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.tools.load_test", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--url", help="Servidor local (ej. http://127.0.0.1:8000). Sin --url: en proceso")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--requests", type=int, default=100, help="Total de requests (ignorado con --duration)")
+    parser.add_argument("--duration", type=float, default=None, help="Segundos de carga")
+    parser.add_argument("--mix", default=None,
+                        help="Pesos 'tipo=peso,...' sobre " + ",".join(DEFAULT_MIX) + " (default: %s)"
+                        % ",".join(f"{k}={v}" for k, v in DEFAULT_MIX.items()))
+    parser.add_argument("--oversized-mb", type=float, default=15.0, help="Tamaño de los PDFs 'grande'")
+    parser.add_argument("--corpus", help="Directorio con PDFs reales para el tráfico 'texto'")
+    parser.add_argument("--timeout", type=float, default=120.0, help="Timeout por request (s)")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", dest="json_out", help="Guarda el reporte en este archivo JSON")
+    args = parser.parse_args(argv)
+
+    mix = dict(DEFAULT_MIX)
+    if args.mix:
+        mix = {k: 0 for k in DEFAULT_MIX}
+        for part in args.mix.split(","):
+            k, _, v = part.partition("=")
+            if k.strip() not in DEFAULT_MIX:
+                parser.error(f"Tipo de tráfico desconocido: {k}")
+            mix[k.strip()] = int(v or 0)
+
+    traffic = TrafficMix(mix, args.oversized_mb, corpus=args.corpus, seed=args.seed)
+    total = None if args.duration else args.requests
+
+    with tempfile.TemporaryDirectory(prefix="loadtest_") as tmp:
+        client = http_client(args.url) if args.url else asgi_client(_isolated_app(Path(tmp)))
+        report = asyncio.run(run_load(
+            client, traffic, args.concurrency, total, args.duration, args.timeout,
+            probe_path="/" if args.url else None,
+        ))
+
+    report["config"] = {
+        "modo": args.url or "en-proceso",
+        "concurrency": args.concurrency,
+        "mix": mix,
+        "oversized_mb": args.oversized_mb,
+    }
+    print(format_report(report))
+    if args.json_out:
+        Path(args.json_out).write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding="utf-8")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,401 @@
+"""
+Barrido paralelo de parámetros del detector visual de firma (SIG_* en pdf_auditor.py).
+
+1) Precálculo (una vez por corpus, en todos los núcleos): renderiza cada PDF etiquetado,
+   umbraliza cada banda ROI candidata y guarda en caché (.npz) los rasgos de cada
+   contorno [área, x, y, ancho, alto, complejidad] y el tiempo de cada banda.
+2) Barrido: evalúa la grilla de parámetros sobre los rasgos cacheados con NumPy
+   vectorizado (sin volver a renderizar ni umbralizar), repartiendo la grilla entre procesos.
+3) Reporta precisión / recall / F1 y latencia estimada del detector por configuración, y
+   con --write-best escribe SOLO la mejor en settings.SIG_PARAMS_FILE (la lee pdf_auditor).
+
+Etiquetas: CSV con columnas archivo,firma (1/0, si/no, true/false) relativo a --corpus,
+o bien --corpus con subcarpetas con_firma/ y sin_firma/.
+
+    python -m app.tools.tune_signature --corpus datasets_firmas --labels etiquetas.csv --out barrido.csv
+    python -m app.tools.tune_signature --corpus datasets_firmas --write-best --min-precision 0.95
+
+Evalúa solo la etapa visual: la detección de firma por texto (que corre antes) no interviene.
+"""
+import argparse
+import csv
+import hashlib
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from app.core.config import settings
+from app.services import pdf_auditor as pa
+
+CACHE_VERSION = 2
+DEFAULT_CACHE_DIR = Path(settings.BASE_DIR) / ".cache" / "sig_features"
+
+# Bandas candidatas: las actuales + las de modo thorough (sin repetir)
+DEFAULT_BANDS: List[Tuple[float, float]] = list(dict.fromkeys(pa.SIG_ROI_BANDS + pa.SIG_ROI_BANDS_THOROUGH))
+
+DEFAULT_GRID: Dict[str, List[float]] = {
+    "SIG_MIN_AREA": [20, 35, 50, 80, 120, 200],
+    "SIG_MAX_AREA": [4000, 8000, 12000, 20000, 40000],
+    "SIG_MIN_STROKES": [2, 3, 4, 5, 6, 8, 10, 14],
+    "SIG_MIN_COMPLEX": [5, 10, 15, 25, 40],
+    "SIG_MAX_COMPLEX": [400, 700, 1100, 1600, 2500],
+}
+
+
+# =========================
+# Corpus
+# =========================
+def _parse_label(v: str) -> int:
+    return 1 if str(v).strip().lower() in ("1", "si", "sí", "true", "yes", "x") else 0
+
+
+def load_corpus(corpus: str, labels_csv: Optional[str] = None) -> List[Tuple[str, int]]:
+    """[(ruta_pdf, etiqueta)] ordenado por ruta."""
+    root = Path(corpus)
+    items: List[Tuple[str, int]] = []
+    if labels_csv:
+        with open(labels_csv, "r", encoding="utf-8-sig", newline="") as fh:
+            for row in csv.DictReader(fh):
+                items.append((str(root / row["archivo"]), _parse_label(row["firma"])))
+    else:
+        for sub, label in (("con_firma", 1), ("sin_firma", 0)):
+            items.extend((str(p), label) for p in (root / sub).glob("*.pdf"))
+    if not items:
+        raise SystemExit(f"Corpus vacío: {corpus} (use --labels o subcarpetas con_firma/ y sin_firma/)")
+    return sorted(items)
+
+
+# =========================
+# Precálculo + caché
+# =========================
+def _cache_key(file_path: str, dpi: int, bands: Sequence[Tuple[float, float]]) -> str:
+    h = hashlib.sha1()
+    with open(file_path, "rb") as fh:
+        for chunk in iter(lambda: fh.read(1 << 20), b""):
+            h.update(chunk)
+    h.update(json.dumps({"v": CACHE_VERSION, "dpi": dpi, "bands": list(bands),
+                         "max_pages": settings.PDF_MAX_PAGES}).encode("utf-8"))
+    return h.hexdigest()
+
+
+def extract_features(file_path: str, dpi: int, bands: Sequence[Tuple[float, float]]) -> Dict[str, np.ndarray]:
+    """
+    Rasgos de contorno de un PDF. feats: (n, 6); band: (n,) índice de banda;
+    group: (n,) índice de (página, banda, umbral), la unidad en que el detector cuenta trazos;
+    band_ms: (B,) ms de umbralizado por banda (sumado en páginas); render_ms: escalar.
+    """
+    feats: List[np.ndarray] = []
+    band_idx: List[np.ndarray] = []
+    group_idx: List[np.ndarray] = []
+    n_groups = 0
+    band_ms = np.zeros(len(bands), dtype=np.float64)
+    render_ms = 0.0
+
+    pages = pa._iter_pages(file_path, dpi=dpi)
+    while True:
+        t0 = time.perf_counter()
+        im = next(pages, None)
+        render_ms += (time.perf_counter() - t0) * 1000
+        if im is None:
+            break
+        gray = np.asarray(im)
+        # Áreas en px² a RENDER_DPI, como SIG_MIN_AREA/SIG_MAX_AREA en el detector en vivo
+        scale = pa._area_scale(pa._page_dpi(im, dpi))
+        for b, band in enumerate(bands):
+            t0 = time.perf_counter()
+            per_th = pa._roi_contour_features(gray, band)
+            band_ms[b] += (time.perf_counter() - t0) * 1000
+            for f in per_th:
+                if scale != 1.0:
+                    f[:, 0] /= scale
+                feats.append(f)
+                band_idx.append(np.full(len(f), b, dtype=np.int16))
+                group_idx.append(np.full(len(f), n_groups, dtype=np.int32))
+                n_groups += 1
+
+    return {
+        "feats": np.concatenate(feats) if feats else np.zeros((0, 6), dtype=np.float64),
+        "band": np.concatenate(band_idx) if band_idx else np.zeros(0, dtype=np.int16),
+        "group": np.concatenate(group_idx) if group_idx else np.zeros(0, dtype=np.int32),
+        "n_groups": np.int64(n_groups),
+        "band_ms": band_ms,
+        "render_ms": np.float64(render_ms),
+    }
+
+
+def _cached_features(args: Tuple[str, int, List[Tuple[float, float]], str]) -> Optional[Dict[str, np.ndarray]]:
+    file_path, dpi, bands, cache_dir = args
+    try:
+        path = Path(cache_dir) / f"{_cache_key(file_path, dpi, bands)}.npz"
+        if path.exists():
+            with np.load(path) as data:
+                return {k: data[k] for k in data.files}
+        out = extract_features(file_path, dpi, bands)
+    except Exception as e:
+        print(f"[WARN] Se omite {file_path}: {e}", file=sys.stderr)
+        return None
+    tmp = path.with_name(path.stem + f".{os.getpid()}.tmp.npz")
+    np.savez_compressed(tmp, **out)
+    os.replace(tmp, path)
+    return out
+
+
+def precompute(
+    items: List[Tuple[str, int]],
+    dpi: int,
+    bands: List[Tuple[float, float]],
+    cache_dir: Path,
+    workers: int,
+) -> Dict[str, np.ndarray]:
+    """
+    Rasgos de todo el corpus aplanados: feats (N, 6), db (N,) = doc * B + banda,
+    group (N,) global, n_groups, labels (D,), band_ms (D, B), render_ms (D,).
+    """
+    cache_dir.mkdir(parents=True, exist_ok=True)
+    jobs = [(p, dpi, bands, str(cache_dir)) for p, _ in items]
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(_cached_features, jobs, chunksize=4))
+    return stack_features(items, results, len(bands))
+
+
+def stack_features(
+    items: List[Tuple[str, int]],
+    results: List[Optional[Dict[str, np.ndarray]]],
+    n_bands: int,
+) -> Dict[str, np.ndarray]:
+    """Aplana los rasgos por documento en arreglos globales (ver precompute)."""
+    # Los PDFs que no se pudieron renderizar quedan fuera (no cuentan como negativos)
+    kept = [(item, d) for item, d in zip(items, results) if d is not None]
+    items = [item for item, _ in kept]
+    per_doc = [d for _, d in kept]
+    if not per_doc:
+        raise SystemExit("No se pudo extraer rasgos de ningún PDF del corpus")
+
+    offsets = np.cumsum([0] + [int(d["n_groups"]) for d in per_doc])
+    feats = [d["feats"] for d in per_doc]
+    db = [d["band"].astype(np.int64) + i * n_bands for i, d in enumerate(per_doc)]
+    group = [d["group"].astype(np.int64) + offsets[i] for i, d in enumerate(per_doc)]
+    return {
+        "feats": np.concatenate(feats),
+        "db": np.concatenate(db) if db else np.zeros(0, dtype=np.int64),
+        "group": np.concatenate(group) if group else np.zeros(0, dtype=np.int64),
+        "n_groups": int(offsets[-1]),
+        "labels": np.array([lab for _, lab in items], dtype=bool),
+        "band_ms": np.stack([d["band_ms"] for d in per_doc]),
+        "render_ms": np.array([float(d["render_ms"]) for d in per_doc]),
+    }
+
+
+# =========================
+# Evaluación vectorizada
+# =========================
+_DATA: Dict[str, Any] = {}
+
+
+def _init_eval(data: Dict[str, Any]) -> None:
+    _DATA.clear()
+    _DATA.update(data)
+
+
+def band_subsets(n_bands: int, max_size: int) -> np.ndarray:
+    """Matriz booleana (S, B) con todos los subconjuntos no vacíos de hasta `max_size` bandas."""
+    rows = []
+    for k in range(1, min(max_size, n_bands) + 1):
+        for combo in itertools.combinations(range(n_bands), k):
+            row = np.zeros(n_bands, dtype=bool)
+            row[list(combo)] = True
+            rows.append(row)
+    return np.array(rows, dtype=bool)
+
+
+def _eval_filter_combo(combo: Tuple[float, float, float, float]) -> List[Dict[str, Any]]:
+    """
+    Para un (min_area, max_area, min_complex, max_complex) fijo evalúa de una vez todos
+    los SIG_MIN_STROKES x subconjuntos de bandas: una máscara + un maximum.at por combo.
+    """
+    min_area, max_area, min_c, max_c = combo
+    feats, labels = _DATA["feats"], _DATA["labels"]
+    subsets, strokes = _DATA["subsets"], _DATA["strokes"]
+    n_docs, n_bands = _DATA["band_ms"].shape
+    t0 = time.perf_counter()
+
+    mask = pa._stroke_mask(feats, min_area, max_area, min_c, max_c)
+    # trazos por (doc, página, banda, umbral) y luego el máximo por (doc, banda):
+    # el detector en vivo dispara si algún grupo alcanza SIG_MIN_STROKES
+    counts = np.bincount(_DATA["group"], weights=mask, minlength=_DATA["n_groups"])
+    best = np.zeros(n_docs * n_bands, dtype=np.float64)
+    np.maximum.at(best, _DATA["group_db"], counts)
+    best = best.reshape(n_docs, n_bands)
+
+    hit = best[None, :, :] >= np.asarray(strokes)[:, None, None]          # (K, D, B)
+    pred = (hit[:, None, :, :] & subsets[None, :, None, :]).any(axis=-1)   # (K, S, D)
+    tp = (pred & labels).sum(axis=-1)
+    fp = (pred & ~labels).sum(axis=-1)
+    fn = (~pred & labels).sum(axis=-1)
+
+    lat = _DATA["render_ms"][:, None] + _DATA["band_ms"] @ subsets.T.astype(np.float64)  # (D, S)
+    lat_mean, lat_p95 = lat.mean(axis=0), np.percentile(lat, 95, axis=0)
+    eval_us = (time.perf_counter() - t0) * 1e6 / max(1, pred.shape[0] * pred.shape[1])
+
+    out: List[Dict[str, Any]] = []
+    for k, ms in enumerate(strokes):
+        for s in range(subsets.shape[0]):
+            t, f_p, f_n = int(tp[k, s]), int(fp[k, s]), int(fn[k, s])
+            precision = t / (t + f_p) if t + f_p else 0.0
+            recall = t / (t + f_n) if t + f_n else 0.0
+            f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
+            out.append({
+                "SIG_ROI_BANDS": [list(b) for b, on in zip(_DATA["bands"], subsets[s]) if on],
+                "SIG_MIN_AREA": min_area,
+                "SIG_MAX_AREA": max_area,
+                "SIG_MIN_STROKES": int(ms),
+                "SIG_MIN_COMPLEX": min_c,
+                "SIG_MAX_COMPLEX": max_c,
+                "tp": t, "fp": f_p, "fn": f_n,
+                "precision": round(precision, 4),
+                "recall": round(recall, 4),
+                "f1": round(f1, 4),
+                "lat_ms_mean": round(float(lat_mean[s]), 1),
+                "lat_ms_p95": round(float(lat_p95[s]), 1),
+                "eval_us": round(eval_us, 2),
+            })
+    return out
+
+
+def sweep(
+    data: Dict[str, np.ndarray],
+    bands: List[Tuple[float, float]],
+    grid: Dict[str, List[float]],
+    max_bands: int,
+    workers: int,
+) -> List[Dict[str, Any]]:
+    """Evalúa toda la grilla. Devuelve una fila por configuración."""
+    # (doc, banda) de cada grupo; los grupos sin contornos quedan en 0 con conteo 0 (inocuo)
+    group_db = np.zeros(data["n_groups"], dtype=np.int64)
+    group_db[data["group"]] = data["db"]
+    shared = {
+        "feats": data["feats"],
+        "group": data["group"],
+        "n_groups": data["n_groups"],
+        "group_db": group_db,
+        "labels": data["labels"],
+        "band_ms": data["band_ms"],
+        "render_ms": data["render_ms"],
+        "bands": bands,
+        "subsets": band_subsets(len(bands), max_bands),
+        "strokes": [int(v) for v in grid["SIG_MIN_STROKES"]],
+    }
+    combos = [
+        c for c in itertools.product(grid["SIG_MIN_AREA"], grid["SIG_MAX_AREA"],
+                                     grid["SIG_MIN_COMPLEX"], grid["SIG_MAX_COMPLEX"])
+        if c[0] < c[1] and c[2] < c[3]
+    ]
+    rows: List[Dict[str, Any]] = []
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_eval, initargs=(shared,)) as pool:
+        for part in pool.map(_eval_filter_combo, combos, chunksize=max(1, len(combos) // (workers * 8))):
+            rows.extend(part)
+    return rows
+
+
+# =========================
+# Salida
+# =========================
+def pick_best(rows: List[Dict[str, Any]], min_precision: float = 0.0) -> Optional[Dict[str, Any]]:
+    """Mayor F1 con precisión >= min_precision; a igual F1, menor latencia."""
+    ok = [r for r in rows if r["precision"] >= min_precision and r["tp"] > 0]
+    if not ok:
+        return None
+    return min(ok, key=lambda r: (-r["f1"], r["lat_ms_mean"], -r["precision"]))
+
+
+def write_best(best: Dict[str, Any], path: str) -> None:
+    """Escribe solo los parámetros SIG_* (y sus métricas, como referencia) al config en vivo."""
+    out = {k: best[k] for k in pa.SIG_PARAM_KEYS}
+    out["_metricas"] = {k: best[k] for k in ("precision", "recall", "f1", "lat_ms_mean", "lat_ms_p95")}
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as fh:
+        json.dump(out, fh, ensure_ascii=False, indent=2)
+    os.replace(tmp, path)
+
+
+def write_csv(rows: List[Dict[str, Any]], path: str) -> None:
+    if not rows:
+        return
+    with open(path, "w", encoding="utf-8", newline="") as fh:
+        w = csv.DictWriter(fh, fieldnames=list(rows[0].keys()))
+        w.writeheader()
+        for r in rows:
+            w.writerow({**r, "SIG_ROI_BANDS": json.dumps(r["SIG_ROI_BANDS"])})
+
+
+def _parse_bands(spec: str) -> List[Tuple[float, float]]:
+    """'0.55-0.90,0.65-0.95' -> [(0.55, 0.90), (0.65, 0.95)]"""
+    bands = []
+    for part in spec.split(","):
+        top, _, bot = part.strip().partition("-")
+        bands.append((float(top), float(bot)))
+    return bands
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.tools.tune_signature", description=__doc__.split("\n\n")[0])
+    parser.add_argument("--corpus", required=True, help="Directorio de PDFs etiquetados")
+    parser.add_argument("--labels", help="CSV archivo,firma (si no, subcarpetas con_firma/ y sin_firma/)")
+    parser.add_argument("--dpi", type=int, default=pa.RENDER_DPI)
+    parser.add_argument("--bands", help="Bandas candidatas 'top-bot,...' (default: actuales + thorough)")
+    parser.add_argument("--max-bands", type=int, default=3, help="Tamaño máximo de cada subconjunto de bandas")
+    parser.add_argument("--grid", help="JSON con listas para SIG_MIN_AREA, SIG_MAX_AREA, SIG_MIN_STROKES, ...")
+    parser.add_argument("--cache-dir", default=str(DEFAULT_CACHE_DIR))
+    parser.add_argument("--workers", type=int, default=None, help="Procesos (default: todos los núcleos)")
+    parser.add_argument("--out", help="CSV con todas las configuraciones evaluadas")
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--min-precision", type=float, default=0.0)
+    parser.add_argument("--write-best", action="store_true", help="Escribe la mejor configuración al config en vivo")
+    parser.add_argument("--config-out", default=settings.SIG_PARAMS_FILE)
+    args = parser.parse_args(argv)
+
+    workers = args.workers or os.cpu_count() or 1
+    bands = _parse_bands(args.bands) if args.bands else DEFAULT_BANDS
+    grid = dict(DEFAULT_GRID)
+    if args.grid:
+        with open(args.grid, "r", encoding="utf-8") as fh:
+            grid.update(json.load(fh))
+
+    items = load_corpus(args.corpus, args.labels)
+    t0 = time.perf_counter()
+    data = precompute(items, args.dpi, bands, Path(args.cache_dir), workers)
+    print(f"Rasgos: {len(data['labels'])} PDFs, {len(data['feats'])} contornos, "
+          f"{time.perf_counter() - t0:.1f} s (caché: {args.cache_dir})", file=sys.stderr)
+
+    t0 = time.perf_counter()
+    rows = sweep(data, bands, grid, args.max_bands, workers)
+    print(f"Barrido: {len(rows)} configuraciones en {time.perf_counter() - t0:.1f} s ({workers} procesos)",
+          file=sys.stderr)
+
+    rows.sort(key=lambda r: (-r["f1"], r["lat_ms_mean"]))
+    if args.out:
+        write_csv(rows, args.out)
+    for r in rows[:args.top]:
+        print(json.dumps(r, ensure_ascii=False))
+
+    if args.write_best:
+        best = pick_best(rows, args.min_precision)
+        if best is None:
+            print(f"Ninguna configuración alcanza precisión >= {args.min_precision}; no se escribe nada.",
+                  file=sys.stderr)
+            return 1
+        write_best(best, args.config_out)
+        print(f"Config escrita en {args.config_out}", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())